@@ -1,3 +1,5 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from starlette.middleware.cors import CORSMiddleware
 
@@ -9,8 +11,27 @@ from api.routers.admin import router as admin_router
 from api.routers.reviews import router as reviews_router
 
 from api.routers.integrations import router as integration_router
+from core.integrations.tmdb_client import tmdb_client
+from core.db import async_engine
+from core.redis import close_redis
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Открывает общий пул соединений к TMDb на время жизни процесса API
+    и закрывает соединения с TMDb, Redis и БД при остановке.
+    """
+    await tmdb_client.open()
+    yield
+    await tmdb_client.close()
+    await close_redis()
+    await async_engine.dispose()
+
+
 app = FastAPI(
-    title='CineMatch API'
+    title='CineMatch API',
+    lifespan=lifespan
 )
 
 app.include_router(movies_router)
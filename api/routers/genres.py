@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException,status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from api.services.genres import GenreService
 from core.schemas.genres import GenreRead
 
+from core.config import settings
 from core.db import get_db
 router = APIRouter(
     prefix="/genres",
@@ -11,10 +12,12 @@ router = APIRouter(
 
 
 @router.get('/', response_model=list[GenreRead])
-async def get_genres(db: AsyncSession = Depends(get_db)):
+async def get_genres(response: Response, db: AsyncSession = Depends(get_db)):
     genre_service = GenreService(db)
     try:
         genres = await genre_service.get_all_genres()
+        # Жанры почти не меняются: фронтенд не должен запрашивать их на каждой странице
+        response.headers['Cache-Control'] = f'public, max-age={settings.GENRE_HTTP_MAX_AGE}'
         return genres
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
\ No newline at end of file
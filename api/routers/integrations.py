@@ -1,18 +1,28 @@
-from fastapi import APIRouter, Query, HTTPException, status, Depends
+from fastapi import APIRouter, Query, HTTPException, status, Depends, Body
 from celery.result import AsyncResult
 
 from core.models import User as UserModel
 from worker.tasks import (import_single_movie,
+                          import_movies_batch,
                           initial_load,
                           sync_oldest_movies,
                           update_single_movie_stats)
 from core.auth import get_current_admin
+from core.integrations.import_registry import claim_for_dispatch
+from core.integrations.crawl_runs import list_crawl_runs, load_crawl_run
+from core.integrations.circuit_breaker import load_circuit_states
+from core.integrations.tmdb_client import tmdb_client
+from worker.celery_app import QUEUE_INTERACTIVE
+from worker.queues import get_queue_depths
+from core.config import settings
 
 router = APIRouter(
     prefix='/integrations',
     tags=['integrations']
 )
 
+MAX_BATCH_SIZE = 500
+
 
 @router.get('/pages/{page_number}', description='Добавление фильмов по странично с tmdb')
 async def get_movies_by_pages(start_page: int = Query(ge=1, description='Начальная страница скачивания'),
@@ -38,7 +48,7 @@ async def update_movies(batch_size: int, _: UserModel = Depends(get_current_admi
 
 @router.get('/update_movie/{tmdb_movie_id}',description='Обновление одного фильма по tmdb_id')
 async def update_movie(tmdb_movie_id: int, _: UserModel = Depends(get_current_admin)):
-    result = update_single_movie_stats.delay(tmdb_movie_id=tmdb_movie_id)
+    result = update_single_movie_stats.apply_async(kwargs={'tmdb_movie_id': tmdb_movie_id}, queue=QUEUE_INTERACTIVE)
     return {
         'message': f"Movie task triggered for TMDB ID: {result.id}.",
         'task_id': result.id,
@@ -53,9 +63,61 @@ async def get_task_status(task_id: str, _: UserModel = Depends(get_current_admin
         "result": result.result if result.ready() else None
     }
 
+@router.get('/queues', description='Длина очередей Celery (метрика для масштабирования воркеров)')
+async def get_queues(_: UserModel = Depends(get_current_admin)):
+    return {
+        'depths': await get_queue_depths(),
+        'import_high_water': settings.IMPORT_QUEUE_HIGH_WATER,
+        'import_low_water': settings.IMPORT_QUEUE_LOW_WATER,
+    }
+
+@router.get('/tmdb_circuit', description='Состояние предохранителя запросов к TMDB в API и воркерах')
+async def get_tmdb_circuit(_: UserModel = Depends(get_current_admin)):
+    breaker = tmdb_client.circuit_breaker
+    return {
+        'api': breaker.snapshot() if breaker else None,
+        'processes': await load_circuit_states(),
+    }
+
+@router.get('/crawl_runs', description='Последние обходы страниц популярного и их прогресс')
+async def get_crawl_runs(limit: int = Query(20, ge=1, le=100), _: UserModel = Depends(get_current_admin)):
+    return await list_crawl_runs(limit)
+
+@router.get('/crawl_runs/{run_id}', description='Прогресс обхода страниц (run_id совпадает с task_id задачи обхода)')
+async def get_crawl_run(run_id: str, _: UserModel = Depends(get_current_admin)):
+    run = await load_crawl_run(run_id)
+    if run is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Обход не найден")
+    return run
+
+@router.post('/batch', description='Пакетное добавление фильмов в бд по списку tmdb_id')
+async def add_movies_batch(tmdb_movie_ids: list[int] = Body(..., embed=True, min_length=1, max_length=MAX_BATCH_SIZE),
+                           _: UserModel = Depends(get_current_admin)):
+    queued_ids = await claim_for_dispatch(list(dict.fromkeys(tmdb_movie_ids)))
+    if not queued_ids:
+        return {
+            "message": "All TMDB IDs are already queued or were imported recently.",
+            "task_id": None,
+            "status": "DUPLICATE"
+        }
+    # Ручной импорт идет в отдельную очередь и не ждет за задачами массового обхода
+    result = import_movies_batch.apply_async(kwargs={'tmdb_movie_ids': queued_ids}, queue=QUEUE_INTERACTIVE)
+    return {
+        "message": f"Batch import task triggered for {len(queued_ids)} TMDB IDs "
+                   f"({len(tmdb_movie_ids) - len(queued_ids)} already queued).",
+        "task_id": result.id,
+        "status": "PENDING"
+    }
+
 @router.get('/{tmdb_movie_id}', description='Добовление фильма в бд по tmdb_id')
 async def add_movie(tmdb_movie_id: int, _: UserModel = Depends(get_current_admin)):
-    result = import_single_movie.delay(tmdb_movie_id=tmdb_movie_id)
+    if not await claim_for_dispatch([tmdb_movie_id]):
+        return {
+            "message": f"Movie {tmdb_movie_id} is already queued or was imported recently.",
+            "task_id": None,
+            "status": "DUPLICATE"
+        }
+    result = import_single_movie.apply_async(kwargs={'tmdb_movie_id': tmdb_movie_id}, queue=QUEUE_INTERACTIVE)
     return {
         "message": f"Movie import task triggered for TMDB ID: {tmdb_movie_id}.",
         "task_id": result.id,
@@ -4,6 +4,7 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload, contains_eager
 
+from api.services.integrations import hydrate_actor_on_view
 from core.models import Actor, MovieActor, Movie, MovieGenre, User, UserMovieProgress
 
 PAGE_SIZE = 20
@@ -21,6 +22,9 @@ class ActorService:
         .where(Actor.id == actor_id))
         if result is None:
             raise ValueError(f'Актера с таким id: {actor_id} не найдено')
+        if result.biography is None and result.birthday is None:
+            # Актер создан из состава фильма и еще не догружен фоновой задачей
+            await hydrate_actor_on_view(self.db, result)
         return result
 
 
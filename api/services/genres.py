@@ -1,6 +1,45 @@
+import time
+from typing import Dict, List, Optional
+
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import settings
 from core.models.movies import Genre
+from core.schemas.genres import GenreRead
+
+
+class GenreCache:
+    """
+    Справочник жанров в памяти процесса (API или воркера).
+
+    Жанров около двадцати, и меняются они почти никогда, поэтому список читается из БД
+    один раз за ttl секунд. После создания нового жанра кэш процесса сбрасывается через invalidate(),
+    остальные процессы увидят жанр по истечении ttl.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._genres: Optional[List[GenreRead]] = None
+        self._loaded_at = 0.0
+
+    def invalidate(self):
+        self._genres = None
+
+    async def get_all(self, session: AsyncSession) -> List[GenreRead]:
+        # Пустой список не кэшируем: до первого импорта жанров API иначе отдавал бы 404 весь ttl
+        if not self._genres or time.monotonic() - self._loaded_at >= self.ttl:
+            genres = (await session.scalars(select(Genre).order_by(Genre.id))).all()
+            self._genres = [GenreRead.model_validate(genre) for genre in genres]
+            self._loaded_at = time.monotonic()
+        return self._genres
+
+    async def get_ids(self, session: AsyncSession) -> Dict[int, int]:
+        """Словарь tmdb_id -> id всех известных жанров."""
+        return {genre.tmdb_id: genre.id for genre in await self.get_all(session)}
+
+
+genre_cache = GenreCache(settings.GENRE_CACHE_TTL)
 
 
 class GenreService:
@@ -8,9 +47,7 @@ class GenreService:
         self.db = db
 
     async def get_all_genres(self):
-        result = (await self.db.scalars(select(Genre))).all()
+        result = await genre_cache.get_all(self.db)
         if not result:
             raise ValueError("Genre not found")
         return list(result)
-
-
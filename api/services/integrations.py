@@ -1,94 +1,150 @@
 from contextlib import asynccontextmanager
-from typing import List, Optional
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
 import asyncio
+from itertools import islice
 
 import httpx
-from celery.bin.result import result
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update, values, column, bindparam, func, and_, or_, Integer, Float
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from core.models import *
 from core.schemas.actors import ActorCreate
 from core.schemas.genres import GenreBase
 
-from core.integrations.tmdb_client import fetch_tmdb_data, fetch_popular_movie_ids
-from core.integrations.movie_dto import transform_tmdb_movie
+from core.integrations.tmdb_client import fetch_tmdb_data, fetch_popular_movie_ids, fetch_movie_details
+from core.integrations.movie_dto import movie_insert_params
 
-from core.integrations.actor_dto import transform_tmdb_actor
+from core.integrations.actor_dto import transform_tmdb_actor, cast_member_params
+from core.integrations.crawl_planner import plan_crawl_pages, record_page_yields
+from core.integrations.crawl_runs import (STATUS_FAILED, STATUS_FINISHED,
+                                          load_crawl_run, save_crawl_run, start_crawl_run)
+from core.integrations.actor_hydration import (queue_actor_hydration, pop_actor_hydration,
+                                               is_actor_hydration_pending, complete_actor_hydration)
 from core.integrations.genre_dto import transform_tmdb_genre
-from worker.celery_app import celery_app
-
+from core.integrations.tmdb_export import iter_export_movie_ids
+from core.integrations.import_registry import (claim_for_dispatch, forget_dispatch,
+                                               acquire_import_locks, release_import_locks)
+from worker.celery_app import QUEUE_IMPORT
+from worker.publisher import TaskMessage, publish_tasks
+from worker.queues import wait_for_queue_capacity
+
+from core.config import settings
 from core.db import async_session_maker
-
-
-
-async def get_or_create_genre(session: AsyncSession, genre_data: GenreBase) -> Genre:
-    """Ищет жанр по TMDB ID и создает, если не найден."""
-
-    stmt = select(Genre).where(Genre.tmdb_id == genre_data.tmdb_id)
+from api.services.genres import genre_cache
+from core.redis import get_redis
+
+CHANGES_CHECKPOINT_KEY = 'tmdb:changes:checkpoint'
+# tmdb_id, уже отправленные на обновление по ленте изменений за день (ключ + дата)
+CHANGES_DISPATCHED_KEY_PREFIX = 'tmdb:changes:dispatched:'
+# TMDb отдает изменения не больше чем за 14 дней
+CHANGES_MAX_WINDOW = timedelta(days=14)
+
+
+
+def dialect_insert(session: AsyncSession, model):
+    """
+    Возвращает INSERT с поддержкой ON CONFLICT для диалекта текущей сессии
+    (PostgreSQL в приложении, SQLite в тестах).
+    """
+    if session.bind.dialect.name == 'sqlite':
+        return sqlite_insert(model)
+    return pg_insert(model)
+
+
+def db_time_ago(session: AsyncSession, age: timedelta):
+    """
+    Выражение "текущее время БД минус age" для сравнения с датами, которые проставляет func.now().
+    Считается часами базы, поэтому не зависит от часового пояса воркера.
+    """
+    if session.bind.dialect.name == 'sqlite':
+        return func.datetime('now', f'-{int(age.total_seconds())} seconds')
+    return func.now() - age
+
+
+async def upsert_genres(session: AsyncSession, genres: List[GenreBase]) -> Dict[int, int]:
+    """
+    Создает недостающие жанры одним запросом и возвращает словарь tmdb_id -> id для всех переданных.
+    """
+    rows = {genre.tmdb_id: genre.model_dump() for genre in genres}
+    if not rows:
+        return {}
+
+    # Существующие жанры не обновляем (DO NOTHING), чтобы не брать на них блокировку,
+    # а строки вставляем по возрастанию tmdb_id: параллельные импорты блокируют их в одном порядке
+    await session.execute(dialect_insert(session, Genre)
+                          .values([rows[tmdb_id] for tmdb_id in sorted(rows)])
+                          .on_conflict_do_nothing(index_elements=[Genre.tmdb_id]))
+    existing = await session.execute(select(Genre.tmdb_id, Genre.id).where(Genre.tmdb_id.in_(rows)))
+    return {tmdb_id: genre_id for tmdb_id, genre_id in existing.all()}
+
+
+async def upsert_actors(session: AsyncSession, actors: List[Dict[str, Any]]) -> Dict[int, int]:
+    """
+    Создает или обновляет актеров одним запросом и возвращает словарь tmdb_id -> id.
+    actors — строки из cast_member_params (tmdb_id, name, popularity, profile_path).
+    Параллельные импорты с общими актерами не конфликтуют по уникальному tmdb_id.
+    """
+    # Один актер не может встретиться в одном ON CONFLICT DO UPDATE дважды
+    rows = {actor['tmdb_id']: actor for actor in actors}
+    if not rows:
+        return {}
+
+    # Строки по возрастанию tmdb_id: импорты с общими актерами блокируют их в одном порядке, без взаимных блокировок
+    stmt = dialect_insert(session, Actor).values([rows[tmdb_id] for tmdb_id in sorted(rows)])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Actor.tmdb_id],
+        set_={
+            'name': stmt.excluded.name,
+            'popularity': stmt.excluded.popularity,
+            'profile_path': stmt.excluded.profile_path,
+        },
+    ).returning(Actor.tmdb_id, Actor.id)
     result = await session.execute(stmt)
-    genre = result.scalars().first()
-
-    if genre:
-        return genre
+    return {tmdb_id: actor_id for tmdb_id, actor_id in result.all()}
 
-    new_genre = Genre(
-        tmdb_id=genre_data.tmdb_id,
-        name=genre_data.name
-    )
-    session.add(new_genre)
-    await session.flush()
-    return new_genre
 
+async def insert_links(session: AsyncSession, model, rows: List[dict]):
+    """Добавляет строки связей (MovieGenre, MovieActor) одним запросом, пропуская уже существующие."""
+    if not rows:
+        return
+    await session.execute(dialect_insert(session, model).values(rows).on_conflict_do_nothing())
 
-async def get_or_create_actor(session: AsyncSession, actor_data: ActorCreate) -> Actor:
-    """Ищет актера по TMDB ID и создает, если не найден."""
-    stmt = select(Actor).where(Actor.tmdb_id == actor_data.tmdb_id)
-    result = await session.execute(stmt)
-    actor = result.scalars().first()
 
-    if actor:
-        return actor
+async def gather_limited(semaphore: asyncio.Semaphore, *coros):
+    """
+    Выполняет корутины конкурентно, но не больше, чем позволяет семафор, одновременно.
+    Результаты возвращаются в порядке переданных корутин.
+    """
+    async def run(coro):
+        async with semaphore:
+            return await coro
 
-    new_actor = Actor(**actor_data.model_dump())
-    session.add(new_actor)
-    await session.flush()
-    return new_actor
+    return await asyncio.gather(*(run(coro) for coro in coros))
 
-async def get_trailer_from_tmdb(tmdb_id: int) -> Optional[str]:
-    """Запрашивает видео из TMDB и возвращает ключ YouTube трейлера."""
-    # Сначала пробуем на русском
-    for lang in ["ru-RU", "en-US"]:
-        data = await fetch_tmdb_data(f"/movie/{tmdb_id}/videos", params={"language": lang})
-        if data and data.get('results'):
-            for video in data['results']:
-                if video.get('site') == 'YouTube' and video.get('type') == 'Trailer':
-                    return video.get('key')
-    return None
 
+async def import_movie_and_relations(tmdb_movie_id: int, session: AsyncSession = None) -> Optional[int]:
+    """
+    Выполняет полную транзакцию импорта фильма, актеров и жанров.
+    Возвращает id созданного фильма или None, если данные TMDb получить не удалось.
 
-async def import_movie_and_relations(tmdb_movie_id: int, session: AsyncSession = None):
-    """Выполняет полную транзакцию импорта фильма, актеров и жанров."""
+    Новые актеры создаются из состава (имя, фото, популярность) без запросов к /person,
+    биография и даты догружаются позже задачей hydrate_actors.
+    """
 
     print(f"--- 1. Starting Import for TMDB ID: {tmdb_movie_id} ---")
 
-    raw_movie_data = await fetch_tmdb_data(f"/movie/{tmdb_movie_id}")
-    trailer_key = await get_trailer_from_tmdb(tmdb_movie_id)
-    movie_create_data = transform_tmdb_movie(raw_movie_data)
-    if movie_create_data:
-        movie_create_data.trailer_url = trailer_key
-    raw_credits_data = await fetch_tmdb_data(f"/movie/{tmdb_movie_id}/credits")
-    actors_data = []
+    # Детали, видео и состав приходят одним запросом
+    raw_movie_data = await fetch_movie_details(tmdb_movie_id)
+    # Параметры строк берутся прямо из JSON, без Pydantic-схем и model_dump: импорт массовый
+    movie_data = movie_insert_params(raw_movie_data)
+    raw_credits_data = raw_movie_data.get('credits') if raw_movie_data else None
+    cast_members = []
     if raw_credits_data and raw_credits_data.get('cast'):
-        for cast in raw_credits_data['cast'][:15]:
-            tmdb_actor_id = cast.get('id')
-            raw_actor_data = await fetch_tmdb_data(f"/person/{tmdb_actor_id}")
-            actor_create_data = transform_tmdb_actor(raw_actor_data)
-            actors_data.append({
-                "info": actor_create_data,
-                "character": cast.get('character')
-            })
-
-    if not movie_create_data:
+        cast_members = [cast for cast in raw_credits_data['cast'][:settings.IMPORT_CAST_DEPTH] if cast.get('id')]
+
+    if not movie_data:
         print("🛑 Failed to transform movie data.")
         return
 
@@ -102,56 +158,59 @@ async def import_movie_and_relations(tmdb_movie_id: int, session: AsyncSession =
 
     async with get_session() as active_session:
         try:
+            # Актеры, которые уже есть в базе, берутся одним запросом; новых создаем из состава
+            cast_ids = list(dict.fromkeys(cast['id'] for cast in cast_members))
+            actor_ids = {}
+            if cast_ids:
+                existing_actors = await active_session.execute(
+                    select(Actor.tmdb_id, Actor.id).where(Actor.tmdb_id.in_(cast_ids)))
+                actor_ids = {tmdb_id: actor_id for tmdb_id, actor_id in existing_actors.all()}
+
+            new_actors = [actor for actor in map(cast_member_params, cast_members)
+                          if actor and actor['tmdb_id'] not in actor_ids]
+
+            # Известные жанры берутся из справочника процесса, в БД пишутся только новые
+            genres = [genre for genre in map(transform_tmdb_genre, raw_movie_data.get('genres', [])) if genre]
+            known_genre_ids = await genre_cache.get_ids(active_session)
+            genre_ids = {genre.tmdb_id: known_genre_ids[genre.tmdb_id]
+                         for genre in genres if genre.tmdb_id in known_genre_ids}
+            new_genres = [genre for genre in genres if genre.tmdb_id not in known_genre_ids]
+            genre_ids.update(await upsert_genres(active_session, new_genres))
+
+            print(f"--- 2. Saving Movie: {movie_data['title']}...")
 
-            genre_objects: List[Genre] = []
-            raw_genres = raw_movie_data.get('genres', [])
-
-            for raw_genre in raw_genres:
-                genre_base = transform_tmdb_genre(raw_genre)
-                if genre_base:
-                    # Создаем или находим жанр в БД
-                    genre_obj = await get_or_create_genre(active_session, genre_base)
-                    genre_objects.append(genre_obj)
-
-            print(f"--- 2. Saving Movie: {movie_create_data.title}...")
-
-            movie_data = movie_create_data.model_dump(exclude={'genres_ids'})
             new_movie = Movie(**movie_data)
 
             active_session.add(new_movie)
             await active_session.flush()  # Получаем ID фильма (new_movie.id)
 
-            # C. ОБРАБОТКА ЖАНРОВ (ЯВНАЯ АССОЦИАЦИЯ MovieGenre)
-            print("--- 3. Processing Genres (Explicit Association) ---")
-            for genre_obj in genre_objects:
-                # ❗ Явное создание объекта MovieGenre для связи ❗
-                movie_genre_link = MovieGenre(
-                    movie=new_movie,
-                    genre=genre_obj
-                )
-                active_session.add(movie_genre_link)
-
-            # D. Обработка Актеров (Создание и Связывание через MovieActor)
-            if raw_credits_data and raw_credits_data.get('cast'):
-                print(f"--- 4. Processing cast members...")
-
-                for item in actors_data:
-                    actor_info = item['info']
-                    character_name = item["character"]
-
-                    if actor_info:
-                        actor_obj = await get_or_create_actor(active_session, actor_info)
+            print("--- 3. Processing Genres ---")
+            await insert_links(active_session, MovieGenre, [
+                {'movie_id': new_movie.id, 'genre_id': genre_id} for genre_id in genre_ids.values()
+            ])
 
-                        # Создание записи M2M (MovieActor)
-                        movie_actor_link = MovieActor(
-                            movie_id=new_movie.id,
-                            actor_id=actor_obj.id,
-                            role_name=character_name
-                        )
-                        active_session.add(movie_actor_link)
+            if cast_members:
+                print(f"--- 4. Processing cast members...")
+                actor_ids.update(await upsert_actors(active_session, new_actors))
+
+                movie_actor_rows = {}
+                for cast in cast_members:
+                    actor_id = actor_ids.get(cast['id'])
+                    # Актер мог встретиться в составе дважды: оставляем первую роль
+                    if actor_id is not None and actor_id not in movie_actor_rows:
+                        movie_actor_rows[actor_id] = {
+                            'movie_id': new_movie.id,
+                            'actor_id': actor_id,
+                            'role_name': cast.get('character'),
+                        }
+                await insert_links(active_session, MovieActor, list(movie_actor_rows.values()))
 
             await active_session.commit()
+            if new_genres:
+                genre_cache.invalidate()
+            await queue_actor_hydration(list(dict.fromkeys(actor['tmdb_id'] for actor in new_actors)))
             print(f"✅ SUCCESSFULLY IMPORTED: {new_movie.title} (Movie ID: {new_movie.id})")
+            return new_movie.id
 
         except Exception as e:
             print(f"🛑 An error occurred during database transaction: {e}")
@@ -160,66 +219,405 @@ async def import_movie_and_relations(tmdb_movie_id: int, session: AsyncSession =
 
 
 
-async def run_initial_load(start_page: int, end_page: int):
-    all_movies_ids = set()
+async def run_import_batch(tmdb_movie_ids: List[int]) -> Dict[str, Any]:
+    """
+    Импортирует список фильмов конкурентно в одном цикле событий и с одним пулом соединений TMDb.
+    Фильмы, которые уже есть в базе или прямо сейчас импортируются другим воркером, пропускаются.
+    Ошибка одного фильма не прерывает остальные.
+    """
+    tmdb_movie_ids = list(dict.fromkeys(tmdb_movie_ids))
+    locked_ids = await acquire_import_locks(tmdb_movie_ids)
+    locked = set(locked_ids)
+
+    async def import_one(tmdb_movie_id: int):
+        try:
+            movie_id = await import_movie_and_relations(tmdb_movie_id)
+        except Exception as e:
+            return tmdb_movie_id, str(e)
+        return tmdb_movie_id, None if movie_id else 'TMDB data unavailable'
 
+    try:
+        # Проверяем наличие уже после захвата: фильм мог импортировать воркер, который только что отпустил его
+        async with async_session_maker() as session:
+            existing_ids = set((await session.scalars(
+                select(Movie.tmdb_id).where(Movie.tmdb_id.in_(locked_ids)))).all()) if locked_ids else set()
+
+        semaphore = asyncio.Semaphore(settings.IMPORT_BATCH_CONCURRENCY)
+        results = await gather_limited(
+            semaphore,
+            *(import_one(tmdb_movie_id) for tmdb_movie_id in locked_ids if tmdb_movie_id not in existing_ids),
+        )
+    finally:
+        await release_import_locks(locked_ids)
+
+    report = {
+        'imported': [tmdb_movie_id for tmdb_movie_id, error in results if error is None],
+        'skipped': [tmdb_movie_id for tmdb_movie_id in locked_ids if tmdb_movie_id in existing_ids],
+        'in_progress': [tmdb_movie_id for tmdb_movie_id in tmdb_movie_ids if tmdb_movie_id not in locked],
+        'failed': [{'tmdb_id': tmdb_movie_id, 'error': error} for tmdb_movie_id, error in results if error],
+    }
+    # Неудачные фильмы снова можно ставить в очередь, не дожидаясь IMPORT_DEDUP_TTL
+    await forget_dispatch([item['tmdb_id'] for item in report['failed']])
+    print(f"📦 Batch import: {len(report['imported'])} imported, {len(report['skipped'])} skipped, "
+          f"{len(report['in_progress'])} in progress elsewhere, {len(report['failed'])} failed.")
+    return report
+
+
+def chunked(items: List[Any], size: int) -> List[List[Any]]:
+    """Разбивает список на части не больше size элементов."""
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+async def fetch_popular_pages(pages: List[int]) -> Dict[int, Optional[List[int]]]:
+    """
+    Запрашивает страницы популярных фильмов конкурентно (темп задает общий лимитер TMDb).
+    Возвращает tmdb_id фильмов по каждой странице; None — страницу получить не удалось.
+    """
+    async def fetch_page(page: int):
+        try:
+            print(f"📡 Запрашиваем страницу {page}...")
+            data = await fetch_popular_movie_ids(page)
+        except Exception as e:
+            print(f"❌ Ошибка на странице {page}: {e}")
+            return page, None
+        return page, [movie_data['id'] for movie_data in data.get("results", [])]
+
+    semaphore = asyncio.Semaphore(settings.CRAWL_PAGE_CONCURRENCY)
+    return dict(await gather_limited(semaphore, *(fetch_page(page) for page in pages)))
+
+
+async def dispatch_import_batches(tmdb_movie_ids: List[int]) -> int:
+    """
+    Ставит фильмы на импорт пачками по IMPORT_BATCH_SIZE. Возвращает число поставленных фильмов.
+    Фильмы, которые уже стоят в очереди или недавно импортировались, повторно не ставятся.
+    Пока очередь импорта длиннее IMPORT_QUEUE_HIGH_WATER, публикация ждет ее разгрузки.
+    """
+    tmdb_movie_ids = await claim_for_dispatch(tmdb_movie_ids)
+    if not tmdb_movie_ids:
+        return 0
+    messages = [TaskMessage('worker.tasks.import_movies_batch', {'tmdb_movie_ids': batch})
+                for batch in chunked(tmdb_movie_ids, settings.IMPORT_BATCH_SIZE)]
+    # Длину очереди проверяем перед каждой частью: часть выгрузки TMDb — это сотни задач,
+    # и опубликованные разом они превысили бы IMPORT_QUEUE_HIGH_WATER больше чем вдвое
+    for chunk in chunked(messages, settings.IMPORT_PUBLISH_CHUNK):
+        await wait_for_queue_capacity(QUEUE_IMPORT, settings.IMPORT_QUEUE_HIGH_WATER, settings.IMPORT_QUEUE_LOW_WATER)
+        await publish_tasks(chunk)
+    return len(tmdb_movie_ids)
+
+
+async def run_initial_load(start_page: int, end_page: int, run_id: Optional[str] = None) -> Dict[str, int]:
+    """Обходит страницы популярных фильмов TMDb с start_page по end_page подряд."""
+    return await run_crawl_pages(list(range(start_page, end_page + 1)), run_id=run_id)
+
+
+async def run_adaptive_crawl(start_page: int, end_page: int, run_id: Optional[str] = None) -> Dict[str, int]:
+    """
+    Обходит диапазон страниц популярного по плану из истории их отдачи: пустые страницы
+    пропускаются, а диапазон расширяется, пока последние страницы приносят новые фильмы.
+    """
+    # Прерванный обход продолжается по своему плану, новый план не строим
+    if run_id and await load_crawl_run(run_id):
+        return await run_crawl_pages([], run_id=run_id)
+    return await run_crawl_pages(await plan_crawl_pages(start_page, end_page), run_id=run_id)
+
+
+async def run_crawl_pages(pages: List[int], run_id: Optional[str] = None) -> Dict[str, int]:
+    """
+    Обходит страницы популярных фильмов TMDb и ставит на импорт фильмы, которых еще нет в базе.
+
+    Страницы запрашиваются конкурентно группами по CRAWL_PAGE_BATCH_SIZE, наличие фильмов
+    проверяется одним запросом на группу, задачи импорта публикуются пачками.
+    Сколько новых фильмов принесла каждая страница, записывается в историю планировщика обхода.
+
+    С run_id прогресс сохраняется после каждой группы страниц, и повторный запуск с тем же
+    run_id (задача вернулась в очередь после падения воркера) продолжает с последней группы.
+    """
+    stats = {'pages': 0, 'found': 0, 'existing': 0, 'dispatched': 0, 'duplicates': 0, 'failed_pages': 0}
+    run = None
+    if run_id:
+        run = await start_crawl_run(run_id, pages, stats)
+        pages, stats = run['pages'], run['stats']
+    try:
+        await crawl_page_groups(pages, stats, run)
+    except Exception:
+        if run:
+            run['status'] = STATUS_FAILED
+            await save_crawl_run(run)
+        raise
+
+    if run:
+        run['status'] = STATUS_FINISHED
+        await save_crawl_run(run)
+    print(f"Обход завершен. Страниц: {stats['pages']}, найдено фильмов: {stats['found']}, "
+          f"уже в базе: {stats['existing']}, отправлено на импорт: {stats['dispatched']}, "
+          f"уже в очереди: {stats['duplicates']}.")
+    return stats
+
+
+async def crawl_page_groups(pages: List[int], stats: Dict[str, int], run: Optional[Dict[str, Any]] = None):
+    """Проходит страницы группами, начиная с курсора обхода run, и накапливает счетчики в stats."""
+    cursor = run['cursor'] if run else 0
+    seen_ids = set()
+
+    for page_group in chunked(pages[cursor:], settings.CRAWL_PAGE_BATCH_SIZE):
+        page_results = await fetch_popular_pages(page_group)
+
+        # Фильмы, впервые встреченные в этом обходе, по страницам
+        ids_by_page = {}
+        reached_end = False
+        for page in page_group:
+            page_ids = page_results[page]
+            if page_ids is None:
+                stats['failed_pages'] += 1
+                continue
+            if not page_ids:
+                print(f"⚠️ Страница {page} пуста. Завершаем.")
+                reached_end = True
+                break
+            stats['pages'] += 1
+            ids_by_page[page] = [tmdb_id for tmdb_id in dict.fromkeys(page_ids) if tmdb_id not in seen_ids]
+            seen_ids.update(page_ids)
+
+        batch_ids = [tmdb_id for page_ids in ids_by_page.values() for tmdb_id in page_ids]
+        if batch_ids:
+            async with async_session_maker() as session:
+                existing_ids = set((await session.scalars(
+                    select(Movie.tmdb_id).where(Movie.tmdb_id.in_(batch_ids)))).all())
+            new_ids = [tmdb_id for tmdb_id in batch_ids if tmdb_id not in existing_ids]
+            dispatched = await dispatch_import_batches(new_ids)
+
+            stats['found'] += len(batch_ids)
+            stats['existing'] += len(existing_ids)
+            stats['dispatched'] += dispatched
+            stats['duplicates'] += len(new_ids) - dispatched
+        else:
+            existing_ids = set()
+
+        await record_page_yields({page: sum(tmdb_id not in existing_ids for tmdb_id in page_ids)
+                                  for page, page_ids in ids_by_page.items()})
+
+        cursor += len(page_group)
+        if run:
+            run['cursor'] = cursor
+            await save_crawl_run(run)
+
+        if reached_end:
+            break
+
+async def apply_movie_stats(session: AsyncSession, stats: List[Dict[str, Any]]) -> int:
+    """
+    Записывает рейтинг и популярность многих фильмов одним UPDATE ... FROM (VALUES ...).
+    stats — список словарей с ключами tmdb_id, rating, popularity. Возвращает число обновленных строк.
+    """
+    if not stats:
+        return 0
+
+    movies = Movie.__table__
+    if session.bind.dialect.name == 'sqlite':
+        # SQLite (тесты) не умеет именовать колонки VALUES: тот же UPDATE через executemany
+        stmt = (update(movies)
+                .where(movies.c.tmdb_id == bindparam('b_tmdb_id'))
+                .values(rating=bindparam('b_rating'),
+                        popularity=bindparam('b_popularity'),
+                        update_date_at=func.now()))
+        result = await session.execute(stmt, [
+            {'b_tmdb_id': row['tmdb_id'], 'b_rating': row['rating'], 'b_popularity': row['popularity']}
+            for row in stats
+        ])
+        return result.rowcount
+
+    new_stats = values(column('tmdb_id', Integer), column('rating', Float), column('popularity', Float),
+                       name='new_stats').data([(row['tmdb_id'], row['rating'], row['popularity']) for row in stats])
+    stmt = (update(movies)
+            .where(movies.c.tmdb_id == new_stats.c.tmdb_id)
+            .values(rating=new_stats.c.rating,
+                    popularity=new_stats.c.popularity,
+                    # Отмечаем обновление, даже если цифры не изменились: по этой дате планируется следующее
+                    update_date_at=func.now()))
+    result = await session.execute(stmt)
+    return result.rowcount
+
+
+async def run_update_stats_batch(tmdb_movie_ids: List[int]) -> Dict[str, int]:
+    """
+    Обновляет рейтинг и популярность списка фильмов: данные TMDb запрашиваются конкурентно,
+    а в базу пишутся одним запросом на STATS_UPDATE_BATCH_SIZE фильмов.
+    """
+    async def fetch_stats(tmdb_movie_id: int):
+        raw_data = await fetch_tmdb_data(f"/movie/{tmdb_movie_id}")
+        if not raw_data:
+            return None
+        # Без одного из полей фильм пропускаем: нули затерли бы сохраненную статистику
+        if raw_data.get('vote_average') is None or raw_data.get('popularity') is None:
+            print(f"⚠️ TMDB returned no stats for movie {tmdb_movie_id}, keeping stored values.")
+            return None
+        return {'tmdb_id': tmdb_movie_id,
+                'rating': raw_data['vote_average'],
+                'popularity': raw_data['popularity']}
+
+    semaphore = asyncio.Semaphore(settings.STATS_FETCH_CONCURRENCY)
+    fetched = await gather_limited(semaphore, *(fetch_stats(tmdb_movie_id)
+                                                for tmdb_movie_id in dict.fromkeys(tmdb_movie_ids)))
+    stats = [row for row in fetched if row]
+
+    updated = 0
     async with async_session_maker() as session:
-        for page in range(start_page, end_page + 1):
-            try:
-                print(f"📡 Запрашиваем страницу {page} из {end_page}...")
-
-                data = await fetch_popular_movie_ids(page)
-                data_result = data.get("results", [])
-                if not data_result:
-                    print(f"⚠️ Страница {page} пуста. Завершаем.")
-                    break
-                current_page_ids = []
-
-                for movie_data in data_result:
-                    current_page_ids.append((movie_data['id']))
-
-                    result = (await session.scalars(
-                        select(Movie.tmdb_id)
-                        .where(Movie.tmdb_id.in_(current_page_ids)))
-                              ).all()
-                    existing_ids = set(result)
-
-                for movie_data in data_result:
-                    if movie_data['id'] in existing_ids:
-                        continue
-                    else:
-                        celery_app.send_task('worker.tasks.import_single_movie',
-                                             kwargs={'tmdb_movie_id': movie_data['id']})
-                all_movies_ids.update(current_page_ids)
-
-            except Exception as e:
-                await session.rollback()
-                print(f"❌ Ошибка на странице {page}: {e}")
-
-            await asyncio.sleep(1)
-
-    print(f"Начальная загрузка завершена. Запущено задач для {len(all_movies_ids)} уникальных фильмов.")
-    print(all_movies_ids)
+        try:
+            for batch in chunked(stats, settings.STATS_UPDATE_BATCH_SIZE):
+                updated += await apply_movie_stats(session, batch)
+            await session.commit()
+        except Exception as e:
+            print(f"🛑 Error updating stats batch: {e}")
+            await session.rollback()
+            raise
+
+    print(f"✨ Stats updated for {updated} movies ({len(fetched) - len(stats)} not fetched).")
+    return {'updated': updated, 'not_fetched': len(fetched) - len(stats)}
+
+
+async def run_export_load(path: str, min_popularity: float, dispatch: bool = True) -> Dict[str, int]:
+    """
+    Загружает каталог из файла ежедневной выгрузки TMDb вместо обхода страниц популярного.
+
+    Файл читается потоково частями по EXPORT_CHUNK_SIZE id, поэтому память не зависит от его размера.
+    Для каждой части одним запросом отсеиваются фильмы, которые уже есть в базе, а новые
+    ставятся на пакетный импорт (dispatch=True) или импортируются прямо в этом процессе.
+    """
+    export_ids = iter_export_movie_ids(path, min_popularity)
+    stats = {'read': 0, 'existing': 0, 'new': 0}
+
+    while True:
+        # Чтение и распаковка — блокирующие операции, выполняем их вне цикла событий
+        chunk = await asyncio.to_thread(lambda: list(islice(export_ids, settings.EXPORT_CHUNK_SIZE)))
+        if not chunk:
+            break
+
+        async with async_session_maker() as session:
+            existing_ids = set((await session.scalars(
+                select(Movie.tmdb_id).where(Movie.tmdb_id.in_(chunk)))).all())
+        new_ids = [tmdb_id for tmdb_id in chunk if tmdb_id not in existing_ids]
+
+        if dispatch:
+            await dispatch_import_batches(new_ids)
+        elif new_ids:
+            await run_import_batch(new_ids)
+
+        stats['read'] += len(chunk)
+        stats['existing'] += len(existing_ids)
+        stats['new'] += len(new_ids)
+        print(f"📥 Выгрузка TMDb: прочитано {stats['read']}, новых {stats['new']}.")
+
+    return stats
+
 
 async def update_movie_stats(tmdb_movie_id: int):
     """Обновляет только рейтинг и популярность фильма."""
-    raw_data = await fetch_tmdb_data(f"/movie/{tmdb_movie_id}")
-    if not raw_data:
-        return
+    return await run_update_stats_batch([tmdb_movie_id])
+
+
+async def apply_actor_details(session: AsyncSession, actors: List[ActorCreate]) -> int:
+    """Записывает биографию и даты актеров (по tmdb_id) одним executemany. Возвращает число строк."""
+    if not actors:
+        return 0
+
+    actors_table = Actor.__table__
+    stmt = (update(actors_table)
+            .where(actors_table.c.tmdb_id == bindparam('b_tmdb_id'))
+            .values(biography=bindparam('b_biography'),
+                    birthday=bindparam('b_birthday'),
+                    deathday=bindparam('b_deathday')))
+    result = await session.execute(stmt, [
+        {'b_tmdb_id': actor.tmdb_id, 'b_biography': actor.biography,
+         'b_birthday': actor.birthday, 'b_deathday': actor.deathday}
+        for actor in actors
+    ])
+    return result.rowcount
+
+
+def transform_actor_details(raw_actor: Optional[Dict[str, Any]]) -> Optional[ActorCreate]:
+    """
+    Преобразует ответ /person для догрузки. Ответ, не прошедший проверку ActorCreate
+    (слишком длинная биография, некорректная дата), считается неполученным.
+    """
+    try:
+        return transform_tmdb_actor(raw_actor)
+    except ValueError as e:
+        print(f"⚠️ Invalid /person payload for actor {raw_actor.get('id')}: {e}")
+        return None
+
+
+async def run_hydrate_actors(limit: int) -> Dict[str, int]:
+    """
+    Догружает биографию и даты до limit актеров из очереди: /person запрашиваются конкурентно,
+    в базу пишутся одним запросом. Актеры, которых не удалось получить, возвращаются в очередь.
+    """
+    tmdb_actor_ids = await pop_actor_hydration(limit)
+    if not tmdb_actor_ids:
+        return {'hydrated': 0, 'not_fetched': 0}
+
+    try:
+        semaphore = asyncio.Semaphore(settings.TMDB_IMPORT_CONCURRENCY)
+        raw_actors = await gather_limited(
+            semaphore, *(fetch_tmdb_data(f"/person/{tmdb_actor_id}") for tmdb_actor_id in tmdb_actor_ids))
+    except Exception:
+        # Актеры уже сняты с очереди: без возврата их биографии не догрузились бы никогда
+        await queue_actor_hydration(tmdb_actor_ids)
+        raise
+    actors = [actor for actor in map(transform_actor_details, raw_actors) if actor]
+    fetched_ids = {actor.tmdb_id for actor in actors}
+    not_fetched = [tmdb_actor_id for tmdb_actor_id in tmdb_actor_ids if tmdb_actor_id not in fetched_ids]
 
     async with async_session_maker() as session:
         try:
-            movie = await session.scalar(
-                select(Movie)
-                .where(Movie.tmdb_id == tmdb_movie_id))
-            if movie:
-                movie.rating = raw_data['vote_average']
-                movie.popularity = raw_data['popularity']
-                await session.commit()
-                print(f"✨ Stats updated for: {movie.title}")
+            hydrated = await apply_actor_details(session, actors)
+            await session.commit()
         except Exception as e:
-            print(f"🛑 Error updating stats for ID {tmdb_movie_id}: {e}")
+            print(f"🛑 Error hydrating actors: {e}")
             await session.rollback()
+            await queue_actor_hydration(tmdb_actor_ids)
+            raise
+
+    await queue_actor_hydration(not_fetched)
+    print(f"🎭 Actors hydrated: {hydrated} ({len(not_fetched)} not fetched, returned to the queue).")
+    return {'hydrated': hydrated, 'not_fetched': len(not_fetched)}
+
+
+async def hydrate_actor_on_view(session: AsyncSession, actor: Actor) -> bool:
+    """
+    Догружает биографию и даты актера, которого открыли раньше, чем до него дошла очередь.
+    Ждет /person не дольше ACTOR_HYDRATION_TIMEOUT: если не успели, страница отдается без биографии.
+    """
+    if not await is_actor_hydration_pending(actor.tmdb_id):
+        return False
+    try:
+        raw_actor = await asyncio.wait_for(fetch_tmdb_data(f"/person/{actor.tmdb_id}"),
+                                           timeout=settings.ACTOR_HYDRATION_TIMEOUT)
+    except asyncio.TimeoutError:
+        print(f"⏱️ /person/{actor.tmdb_id} did not answer in time, actor stays in the hydration queue.")
+        return False
+
+    details = transform_actor_details(raw_actor)
+    if not details:
+        return False
+    actor.biography = details.biography
+    actor.birthday = details.birthday
+    actor.deathday = details.deathday
+    await session.commit()
+    await complete_actor_hydration([actor.tmdb_id])
+    return True
+
+
+async def dispatch_stats_batches(tmdb_movie_ids: List[int], interval: int = 0) -> int:
+    """
+    Ставит фильмы на обновление статистики пачками по REFRESH_DISPATCH_BATCH.
+    interval — отсрочка каждой следующей пачки, сек. Возвращает число задач.
+    """
+    batches = chunked(tmdb_movie_ids, settings.REFRESH_DISPATCH_BATCH)
+    await publish_tasks([TaskMessage('worker.tasks.update_movies_stats_batch',
+                                     {'tmdb_movie_ids': batch},
+                                     {'countdown': number * interval})
+                         for number, batch in enumerate(batches)])
+    return len(batches)
 
 
 async def run_sync_oldest(batch_size: int):
@@ -228,8 +626,127 @@ async def run_sync_oldest(batch_size: int):
             if not result:
                 raise ValueError('БД пуста, фильмов нет.')
 
-            for movie_data in result:
-                celery_app.send_task(
-                    'worker.tasks.update_single_movie_stats',
-                kwargs={'tmdb_movie_id': movie_data.tmdb_id})
+            await dispatch_stats_batches([movie_data.tmdb_id for movie_data in result])
         print(f"🔄 Отправлено на обновление: {len(result)} фильмов.")
+
+
+def get_refresh_tiers():
+    """
+    Уровни популярности для планировщика обновлений: условие отбора и допустимый возраст данных.
+    Порядок списка задает приоритет при распределении бюджета.
+    """
+    hot, warm = settings.REFRESH_HOT_POPULARITY, settings.REFRESH_WARM_POPULARITY
+    return [
+        ('hot', Movie.popularity >= hot, timedelta(hours=settings.REFRESH_HOT_MAX_AGE_HOURS)),
+        ('warm', and_(Movie.popularity >= warm, Movie.popularity < hot),
+         timedelta(hours=settings.REFRESH_WARM_MAX_AGE_HOURS)),
+        ('tail', Movie.popularity < warm, timedelta(hours=settings.REFRESH_TAIL_MAX_AGE_HOURS)),
+    ]
+
+
+async def plan_stale_refresh(session: AsyncSession, budget: int) -> Dict[str, List[int]]:
+    """
+    Выбирает до budget фильмов, данные которых устарели для их уровня популярности.
+    Сначала популярные, внутри уровня — самые давно обновленные.
+    """
+    plan = {}
+    remaining = budget
+    for tier, condition, max_age in get_refresh_tiers():
+        if remaining <= 0:
+            break
+        stmt = (select(Movie.tmdb_id)
+                .where(condition,
+                       or_(Movie.update_date_at.is_(None), Movie.update_date_at < db_time_ago(session, max_age)))
+                .order_by(Movie.update_date_at.asc())
+                .limit(remaining))
+        plan[tier] = list((await session.scalars(stmt)).all())
+        remaining -= len(plan[tier])
+    return plan
+
+
+async def run_refresh_stale(budget: int) -> Dict[str, int]:
+    """
+    Ставит на обновление самые устаревшие фильмы в пределах бюджета запуска.
+    Задачи публикуются пачками по REFRESH_DISPATCH_BATCH с отсрочкой между пачками,
+    чтобы не выбирать квоту TMDb рывком.
+    """
+    async with async_session_maker() as session:
+        plan = await plan_stale_refresh(session, budget)
+
+    tmdb_movie_ids = [tmdb_id for tier_ids in plan.values() for tmdb_id in tier_ids]
+    await dispatch_stats_batches(tmdb_movie_ids, interval=settings.REFRESH_DISPATCH_INTERVAL)
+
+    stats = {tier: len(tier_ids) for tier, tier_ids in plan.items()}
+    print(f"🔄 Плановое обновление: {stats} (бюджет {budget}).")
+    return stats
+
+
+async def fetch_changed_movie_ids(start_date: date, end_date: date) -> set[int]:
+    """
+    Собирает tmdb_id фильмов, изменившихся в TMDb за период, со всех страниц ленты /movie/changes.
+    Если какую-то страницу получить не удалось, бросает RuntimeError, чтобы не потерять изменения.
+    """
+    params = {'start_date': start_date.isoformat(), 'end_date': end_date.isoformat()}
+
+    async def fetch_page(page: int) -> Dict[str, Any]:
+        data = await fetch_tmdb_data('/movie/changes', params={**params, 'page': page})
+        if data is None:
+            raise RuntimeError(f'Не удалось получить страницу {page} ленты изменений TMDb')
+        return data
+
+    first_page = await fetch_page(1)
+    semaphore = asyncio.Semaphore(settings.CRAWL_PAGE_CONCURRENCY)
+    other_pages = await gather_limited(
+        semaphore,
+        *(fetch_page(page) for page in range(2, (first_page.get('total_pages') or 1) + 1)),
+    )
+
+    changed_ids = set()
+    for data in [first_page, *other_pages]:
+        changed_ids.update(item['id'] for item in data.get('results', []) if not item.get('adult'))
+    return changed_ids
+
+
+async def run_sync_changes() -> Dict[str, Any]:
+    """
+    Обновляет только те фильмы каталога, которые изменились в TMDb с прошлой синхронизации.
+    Контрольная точка хранится в Redis, поэтому после перезапуска синхронизация продолжается с нее.
+
+    Лента отдает изменения с точностью до дня, поэтому каждый запуск перечитывает текущий день целиком.
+    Чтобы ежечасный запуск не отправлял одни и те же фильмы повторно, отправленные id
+    запоминаются по дням, и лента читается отдельно за каждый день окна.
+    """
+    redis = get_redis()
+    now = datetime.now(timezone.utc)
+    checkpoint = await redis.get(CHANGES_CHECKPOINT_KEY)
+    start = datetime.fromisoformat(checkpoint) if checkpoint else now - timedelta(days=1)
+    start = max(start, now - CHANGES_MAX_WINDOW)
+
+    changed_ids = set()
+    new_ids_by_day = {}
+    for offset in range((now.date() - start.date()).days + 1):
+        day = start.date() + timedelta(days=offset)
+        day_ids = await fetch_changed_movie_ids(day, day)
+        changed_ids |= day_ids
+        dispatched = await redis.smembers(f'{CHANGES_DISPATCHED_KEY_PREFIX}{day.isoformat()}')
+        new_ids_by_day[day] = day_ids - {int(tmdb_id) for tmdb_id in dispatched}
+    new_ids = set().union(*new_ids_by_day.values())
+
+    our_ids = []
+    async with async_session_maker() as session:
+        for batch in chunked(sorted(new_ids), 1000):
+            our_ids.extend((await session.scalars(
+                select(Movie.tmdb_id).where(Movie.tmdb_id.in_(batch)))).all())
+
+    await dispatch_stats_batches(our_ids)
+
+    # Запоминаем все новые id дня, а не только каталожные: их не нужно проверять в базе повторно
+    for day, day_ids in new_ids_by_day.items():
+        if day_ids:
+            key = f'{CHANGES_DISPATCHED_KEY_PREFIX}{day.isoformat()}'
+            await redis.sadd(key, *day_ids)
+            await redis.expire(key, int((CHANGES_MAX_WINDOW + timedelta(days=1)).total_seconds()))
+    await redis.set(CHANGES_CHECKPOINT_KEY, now.isoformat())
+    print(f"🔄 Изменения TMDb с {start:%Y-%m-%d}: {len(changed_ids)} фильмов, "
+          f"из них в каталоге и отправлено на обновление: {len(our_ids)}.")
+    return {'since': start.isoformat(), 'changed': len(changed_ids), 'dispatched': len(our_ids)}
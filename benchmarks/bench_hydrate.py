@@ -0,0 +1,91 @@
+"""
+Бенчмарк догрузки актеров (/person) против локальной заглушки TMDb.
+
+Импорт берет актеров из состава фильма и ставит их в очередь догрузки; здесь сравнивается
+последовательная выборка очереди (лимит 1 запрос) с параллельной:
+    python -m benchmarks.bench_hydrate --movies 20 --latency 0.05
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import time
+from unittest.mock import patch
+
+os.environ.setdefault('TMDB_API_KEY', 'benchmark')
+
+import httpx
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from api.services.genres import genre_cache
+from api.services.integrations import import_movie_and_relations, run_hydrate_actors
+from benchmarks.fake_tmdb import create_app
+from core.config import settings
+from core.db import Base
+from core.integrations.tmdb_client import tmdb_client
+
+
+async def bench(movies: int, latency: float, concurrency: int) -> float:
+    """Импортирует movies фильмов, затем догружает их актеров. Возвращает среднее время догрузки на актера, сек."""
+    settings.TMDB_IMPORT_CONCURRENCY = concurrency
+    tmdb_client.base_url = 'http://fake-tmdb/3'
+    tmdb_client.transport = httpx.ASGITransport(app=create_app(latency))
+    # Меряем только выборку и запись: общий лимит запросов к TMDb, кэш ответов и предохранитель здесь не нужны
+    tmdb_client.rate_limiter = None
+    tmdb_client.cache = None
+    tmdb_client.circuit_breaker = None
+
+    engine = create_async_engine('sqlite+aiosqlite:///:memory:', poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+    genre_cache.invalidate()
+
+    # Очередь догрузки в памяти вместо Redis
+    pending = []
+
+    async def queue_actors(tmdb_actor_ids):
+        pending.extend(tmdb_actor_ids)
+
+    async def pop_actors(count):
+        popped, pending[:] = pending[:count], pending[count:]
+        return popped
+
+    with patch('api.services.integrations.queue_actor_hydration', queue_actors), \
+            patch('api.services.integrations.pop_actor_hydration', pop_actors), \
+            patch('api.services.integrations.async_session_maker', session_maker), \
+            contextlib.redirect_stdout(io.StringIO()):
+        async with tmdb_client:
+            for tmdb_id in range(1, movies + 1):
+                async with session_maker() as session:
+                    await import_movie_and_relations(tmdb_id, session=session)
+
+            actors = len(pending)
+            started = time.perf_counter()
+            while pending:
+                await run_hydrate_actors(settings.ACTOR_HYDRATION_BATCH)
+            elapsed = time.perf_counter() - started
+
+    await engine.dispose()
+    return elapsed / max(actors, 1)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--movies', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.05, help='Задержка заглушки TMDb на запрос, сек')
+    parser.add_argument('--concurrency', type=int, default=settings.TMDB_IMPORT_CONCURRENCY)
+    args = parser.parse_args()
+
+    serial = await bench(args.movies, args.latency, concurrency=1)
+    parallel = await bench(args.movies, args.latency, concurrency=args.concurrency)
+    print(f'latency={args.latency * 1000:.0f}ms movies={args.movies}')
+    print(f'serial     (concurrency=1):  {serial * 1000:8.1f} ms/actor')
+    print(f'concurrent (concurrency={args.concurrency}): {parallel * 1000:8.1f} ms/actor')
+    print(f'speedup: {serial / parallel:.1f}x')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
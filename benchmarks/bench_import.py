@@ -0,0 +1,95 @@
+"""
+Бенчмарк импорта одного фильма против локальной заглушки TMDb.
+
+Сравнивает прежнюю схему запросов (детали, видео ru и en, состав и /person на каждого актера
+по очереди) с текущей (один запрос с append_to_response, актеры догружаются позже).
+Запись в БД в обоих случаях одинаковая, поэтому разница — это цена запросов к TMDb:
+    python -m benchmarks.bench_import --movies 20 --latency 0.05
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import time
+from unittest.mock import patch
+
+os.environ.setdefault('TMDB_API_KEY', 'benchmark')
+
+import httpx
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from api.services.genres import genre_cache
+from api.services.integrations import import_movie_and_relations
+from benchmarks.fake_tmdb import create_app
+from core.config import settings
+from core.db import Base
+from core.integrations.tmdb_client import fetch_movie_details, fetch_tmdb_data, tmdb_client
+
+
+async def fetch_movie_details_legacy(tmdb_movie_id: int):
+    """Собирает тот же ответ, что fetch_movie_details, прежними последовательными запросами."""
+    movie = await fetch_tmdb_data(f"/movie/{tmdb_movie_id}")
+    videos = []
+    for lang in ["ru-RU", "en-US"]:
+        data = await fetch_tmdb_data(f"/movie/{tmdb_movie_id}/videos", params={"language": lang})
+        videos.extend(data.get('results', []))
+        if any(video.get('site') == 'YouTube' and video.get('type') == 'Trailer' for video in videos):
+            break
+    credits = await fetch_tmdb_data(f"/movie/{tmdb_movie_id}/credits")
+    for cast in credits.get('cast', [])[:settings.IMPORT_CAST_DEPTH]:
+        await fetch_tmdb_data(f"/person/{cast['id']}")
+    return {**movie, 'videos': {'results': videos}, 'credits': credits}
+
+
+async def bench(movies: int, latency: float, fetch_details) -> float:
+    """Импортирует movies фильмов подряд и возвращает среднее время на фильм, сек."""
+    tmdb_client.base_url = 'http://fake-tmdb/3'
+    tmdb_client.transport = httpx.ASGITransport(app=create_app(latency))
+    # Меряем только выборку и запись: общий лимит запросов к TMDb, кэш ответов и предохранитель здесь не нужны
+    tmdb_client.rate_limiter = None
+    tmdb_client.cache = None
+    tmdb_client.circuit_breaker = None
+
+    engine = create_async_engine('sqlite+aiosqlite:///:memory:', poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+    # Справочник жанров остался бы от прошлого прогона с другой БД
+    genre_cache.invalidate()
+
+    async def do_nothing(*args, **kwargs):
+        pass
+
+    # Очередь догрузки актеров живет в Redis, ее меряет bench_hydrate
+    with patch('api.services.integrations.queue_actor_hydration', do_nothing), \
+            patch('api.services.integrations.fetch_movie_details', fetch_details):
+        async with tmdb_client:
+            started = time.perf_counter()
+            for tmdb_id in range(1, movies + 1):
+                async with session_maker() as session:
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        await import_movie_and_relations(tmdb_id, session=session)
+            elapsed = time.perf_counter() - started
+
+    await engine.dispose()
+    return elapsed / movies
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--movies', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.05, help='Задержка заглушки TMDb на запрос, сек')
+    args = parser.parse_args()
+
+    before = await bench(args.movies, args.latency, fetch_movie_details_legacy)
+    after = await bench(args.movies, args.latency, fetch_movie_details)
+    print(f'latency={args.latency * 1000:.0f}ms movies={args.movies}')
+    print(f'before (sequential requests + /person): {before * 1000:8.1f} ms/movie')
+    print(f'after  (one append_to_response request): {after * 1000:8.1f} ms/movie')
+    print(f'speedup: {before / after:.1f}x')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
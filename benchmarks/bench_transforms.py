@@ -0,0 +1,67 @@
+"""
+Микробенчмарк разбора ответов TMDb: записей в секунду на декодирование JSON и на
+преобразование фильма и актеров состава в параметры INSERT.
+
+Сравнивает путь через стандартный json и Pydantic-схемы (MovieCreate/ActorCreate + model_dump)
+с путем импорта (orjson + сразу словарь параметров):
+    python -m benchmarks.bench_transforms --seconds 1
+"""
+import argparse
+import json
+import os
+import time
+
+import orjson
+
+os.environ.setdefault('TMDB_API_KEY', 'benchmark')
+
+from benchmarks.fake_tmdb import FIXTURES_DIR
+from core.integrations.actor_dto import cast_member_params
+from core.integrations.movie_dto import movie_insert_params, transform_tmdb_movie
+from core.schemas.actors import ActorCreate
+
+
+def rate(func, seconds: float) -> float:
+    """Сколько раз в секунду выполняется func (гоняем не меньше seconds секунд)."""
+    calls = 0
+    started = time.perf_counter()
+    while (elapsed := time.perf_counter() - started) < seconds:
+        for _ in range(100):
+            func()
+        calls += 100
+    return calls / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=1.0, help='Время на каждый замер, сек')
+    args = parser.parse_args()
+
+    raw_movie = (FIXTURES_DIR / 'movie.json').read_bytes()
+    movie = json.loads(raw_movie)
+    cast = movie['credits']['cast']
+
+    def legacy_movie():
+        return transform_tmdb_movie(movie).model_dump(exclude={'genres_ids'})
+
+    def legacy_cast():
+        return [ActorCreate(tmdb_id=c['id'], name=c.get('name') or 'N/A',
+                            popularity=c.get('popularity') or 0.0,
+                            profile_path=c.get('profile_path')).model_dump() for c in cast]
+
+    results = [
+        ('decode movie json', rate(lambda: json.loads(raw_movie), args.seconds),
+         rate(lambda: orjson.loads(raw_movie), args.seconds)),
+        ('movie -> insert params', rate(legacy_movie, args.seconds),
+         rate(lambda: movie_insert_params(movie), args.seconds)),
+        ('cast member -> insert row', rate(legacy_cast, args.seconds) * len(cast),
+         rate(lambda: [cast_member_params(c) for c in cast], args.seconds) * len(cast)),
+    ]
+
+    print(f"{'records/sec':<28}{'before':>14}{'after':>14}{'speedup':>10}")
+    for name, before, after in results:
+        print(f'{name:<28}{before:>14,.0f}{after:>14,.0f}{after / before:>9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""
+Локальная заглушка TMDb для бенчмарков и нагрузочных прогонов импорта.
+
+Отдает ответы в формате TMDb: записанные ответы из каталога recordings_dir
+(файл movie_550.json для пути /3/movie/550) либо ответы, собранные из шаблонов
+в benchmarks/fixtures с подставленными id. Задержка, доля ошибок 500 и доля
+ответов 429 настраиваются, счетчики запросов лежат в app.state.
+
+Отдельным сервером:
+    FAKE_TMDB_LATENCY=0.05 FAKE_TMDB_THROTTLE_RATE=0.01 uvicorn benchmarks.fake_tmdb:app --port 8010
+"""
+import asyncio
+import copy
+import json
+import os
+import random
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+FIXTURES_DIR = Path(__file__).parent / 'fixtures'
+CAST_SIZE = 15
+PAGE_SIZE = 20
+
+
+def load_fixture(name: str) -> dict:
+    with open(FIXTURES_DIR / f'{name}.json', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def get_route_kind(path: str) -> str:
+    """Группа запроса для счетчиков: movie, person, popular, changes или other."""
+    parts = path.strip('/').split('/')
+    if len(parts) >= 3 and parts[1] == 'movie' and parts[2] in ('popular', 'changes'):
+        return parts[2]
+    if len(parts) >= 2 and parts[1] in ('movie', 'person'):
+        return parts[1]
+    return 'other'
+
+
+def create_app(latency: float = 0.05,
+               jitter: float = 0.0,
+               error_rate: float = 0.0,
+               throttle_rate: float = 0.0,
+               retry_after: int = 0,
+               cast_size: int = CAST_SIZE,
+               actor_pool: int = 2000,
+               recordings_dir: Optional[str] = None,
+               seed: int = 42) -> FastAPI:
+    """
+    Создает ASGI-приложение, имитирующее TMDb API.
+
+    :param latency: задержка ответа, сек.
+    :param jitter: случайная добавка к задержке от 0 до jitter, сек.
+    :param error_rate: доля запросов, на которые отвечаем 500.
+    :param throttle_rate: доля запросов, на которые отвечаем 429 с Retry-After.
+    :param actor_pool: из скольких разных актеров набирается состав (пересечения между фильмами).
+    :param recordings_dir: каталог с записанными ответами, которые отдаются как есть.
+    """
+    app = FastAPI(title='Fake TMDb')
+    app.state.calls = Counter()
+    app.state.throttled = 0
+    app.state.errors = 0
+    rng = random.Random(seed)
+
+    movie_template = load_fixture('movie')
+    person_template = load_fixture('person')
+    popular_template = load_fixture('popular')
+
+    @app.middleware('http')
+    async def simulate_upstream(request: Request, call_next):
+        app.state.calls[get_route_kind(request.url.path)] += 1
+        await asyncio.sleep(latency + rng.uniform(0, jitter))
+
+        roll = rng.random()
+        if roll < throttle_rate:
+            app.state.throttled += 1
+            return JSONResponse({'status_code': 25, 'status_message': 'Your request count is over the allowed limit.'},
+                                status_code=429, headers={'Retry-After': str(retry_after)})
+        if roll < throttle_rate + error_rate:
+            app.state.errors += 1
+            return JSONResponse({'status_code': 11, 'status_message': 'Internal error.'}, status_code=500)
+
+        if recordings_dir:
+            recorded = Path(recordings_dir) / (request.url.path.removeprefix('/3/').replace('/', '_') + '.json')
+            if recorded.is_file():
+                return Response(recorded.read_bytes(), media_type='application/json')
+        return await call_next(request)
+
+    def movie_videos(movie_id: int, languages: str) -> dict:
+        langs = languages.split(',')
+        results = [video for video in movie_template['videos']['results'] if video['iso_639_1'] in langs]
+        return {'id': movie_id, 'results': results}
+
+    def movie_credits(movie_id: int) -> dict:
+        cast_template = movie_template['credits']['cast'][0]
+        cast = []
+        for order in range(cast_size):
+            actor_id = 1 + (movie_id * 31 + order * 17) % actor_pool
+            cast.append({**cast_template, 'id': actor_id, 'order': order,
+                         'name': f'Актер {actor_id}', 'character': f'Роль {order}'})
+        return {'id': movie_id, 'cast': cast, 'crew': []}
+
+    @app.get('/3/movie/popular')
+    async def popular(page: int = 1):
+        item = popular_template['results'][0]
+        return {
+            **popular_template,
+            'page': page,
+            'results': [{**item, 'id': page * PAGE_SIZE + i} for i in range(PAGE_SIZE)],
+        }
+
+    @app.get('/3/movie/changes')
+    async def changes(page: int = 1):
+        return {'results': [], 'page': page, 'total_pages': 1, 'total_results': 0}
+
+    @app.get('/3/movie/{movie_id}')
+    async def movie(movie_id: int, append_to_response: str = '', include_video_language: str = 'ru'):
+        payload = copy.deepcopy({k: v for k, v in movie_template.items() if k not in ('videos', 'credits')})
+        payload['id'] = movie_id
+        payload['title'] = f"{movie_template['title']} #{movie_id}"
+        appended = append_to_response.split(',')
+        if 'videos' in appended:
+            payload['videos'] = movie_videos(movie_id, include_video_language)
+        if 'credits' in appended:
+            payload['credits'] = movie_credits(movie_id)
+        return payload
+
+    @app.get('/3/movie/{movie_id}/videos')
+    async def videos(movie_id: int, language: str = 'ru-RU'):
+        return movie_videos(movie_id, language.split('-')[0])
+
+    @app.get('/3/movie/{movie_id}/credits')
+    async def credits(movie_id: int):
+        return movie_credits(movie_id)
+
+    @app.get('/3/person/{person_id}')
+    async def person(person_id: int):
+        return {**person_template, 'id': person_id, 'name': f"{person_template['name']} {person_id}"}
+
+    return app
+
+
+app = create_app(
+    latency=float(os.environ.get('FAKE_TMDB_LATENCY', 0.05)),
+    jitter=float(os.environ.get('FAKE_TMDB_JITTER', 0.0)),
+    error_rate=float(os.environ.get('FAKE_TMDB_ERROR_RATE', 0.0)),
+    throttle_rate=float(os.environ.get('FAKE_TMDB_THROTTLE_RATE', 0.0)),
+    recordings_dir=os.environ.get('FAKE_TMDB_RECORDINGS_DIR'),
+)
@@ -1,9 +1,13 @@
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
-from sqlalchemy.pool import NullPool
 from sqlalchemy.orm import DeclarativeBase
 from core.config import settings
 
-async_engine = create_async_engine(settings.DB_URL, echo=True, poolclass=NullPool)
+# Пул соединений живет в цикле событий процесса: API (uvicorn) и воркер Celery (worker.runtime)
+async_engine = create_async_engine(settings.DB_URL,
+                                   echo=True,
+                                   pool_size=settings.DB_POOL_SIZE,
+                                   max_overflow=settings.DB_MAX_OVERFLOW,
+                                   pool_pre_ping=True)
 
 async_session_maker = async_sessionmaker(async_engine, expire_on_commit=False, class_=AsyncSession)
 
@@ -30,4 +30,23 @@ def transform_tmdb_actor(tmdb_data: Dict[str, Any]) -> Optional[ActorCreate]:
         birthday=birthday,
         deathday=deathday,
         profile_path=profile_path,
-    )
\ No newline at end of file
+    )
+
+def cast_member_params(cast_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Преобразует запись актерского состава из credits фильма сразу в строку для INSERT в actors.
+    В составе нет биографии и дат: они догружаются позже из /person.
+    """
+    if not cast_data or 'id' not in cast_data:
+        return None
+
+    name = cast_data.get('name') or 'N/A'
+    # Та же граница, что у ActorCreate.name
+    if len(name) > 50:
+        raise ValueError(f"name: length {len(name)} is outside 1..50")
+    return {
+        'tmdb_id': cast_data['id'],
+        'name': name,
+        'popularity': cast_data.get('popularity') or 0.0,
+        'profile_path': cast_data.get('profile_path'),
+    }
@@ -0,0 +1,45 @@
+from typing import List
+
+from redis.exceptions import RedisError
+
+from core.redis import get_redis
+
+# tmdb_id актеров, созданных из состава фильма без биографии и дат
+PENDING_KEY = 'tmdb:actors:pending'
+
+
+async def queue_actor_hydration(tmdb_actor_ids: List[int]):
+    """Ставит актеров в очередь на догрузку биографии и дат из /person."""
+    if not tmdb_actor_ids:
+        return
+    try:
+        await get_redis().sadd(PENDING_KEY, *tmdb_actor_ids)
+    except RedisError as e:
+        print(f"⚠️ Actor hydration queue unavailable: {e}")
+
+
+async def pop_actor_hydration(count: int) -> List[int]:
+    """Забирает из очереди до count актеров."""
+    try:
+        return [int(tmdb_actor_id) for tmdb_actor_id in await get_redis().spop(PENDING_KEY, count) or []]
+    except RedisError as e:
+        print(f"⚠️ Actor hydration queue unavailable: {e}")
+        return []
+
+
+async def is_actor_hydration_pending(tmdb_actor_id: int) -> bool:
+    try:
+        return bool(await get_redis().sismember(PENDING_KEY, tmdb_actor_id))
+    except RedisError as e:
+        print(f"⚠️ Actor hydration queue unavailable: {e}")
+        return False
+
+
+async def complete_actor_hydration(tmdb_actor_ids: List[int]):
+    """Убирает актеров из очереди (догружены при просмотре страницы)."""
+    if not tmdb_actor_ids:
+        return
+    try:
+        await get_redis().srem(PENDING_KEY, *tmdb_actor_ids)
+    except RedisError as e:
+        print(f"⚠️ Actor hydration queue unavailable: {e}")
@@ -0,0 +1,111 @@
+import json
+import os
+import socket
+import time
+from typing import Any, Dict, List
+
+from redis.exceptions import RedisError
+
+from core.config import settings
+from core.redis import get_redis
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Состояния предохранителей всех процессов (API и воркеров): процесс -> снимок в JSON
+STATES_KEY = 'tmdb:circuit'
+# Состояния процессов, не обновлявшиеся сутки, считаются оставшимися от остановленных процессов
+STATE_STALE_AFTER = 24 * 3600
+
+
+class CircuitOpenError(Exception):
+    """TMDb недоступен: предохранитель разомкнут, запрос не отправлялся."""
+
+
+class CircuitBreaker:
+    """
+    Предохранитель запросов к TMDb на процесс.
+
+    После failure_threshold ошибок подряд (таймауты, сетевые ошибки, ответы 5xx) размыкается,
+    и запросы сразу завершаются CircuitOpenError вместо ожидания таймаута. Через recovery_timeout
+    пропускает один пробный запрос (полуоткрытое состояние): успех замыкает цепь, ошибка снова размыкает.
+    """
+
+    def __init__(self, failure_threshold: int, recovery_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started_at = 0.0
+        self.rejected = 0
+
+    def before_call(self):
+        """Пропускает запрос или выбрасывает CircuitOpenError."""
+        if self.state == CLOSED:
+            return
+        now = time.monotonic()
+        since = self.opened_at if self.state == OPEN else self.probe_started_at
+        # В полуоткрытом состоянии следующая проба — только если предыдущая не ответила за recovery_timeout
+        if now - since >= self.recovery_timeout:
+            self.state = HALF_OPEN
+            self.probe_started_at = now
+            return
+        self.rejected += 1
+        raise CircuitOpenError(f'TMDB circuit is {self.state}, retry in {self.recovery_timeout - (now - since):.0f}s')
+
+    def record_success(self) -> bool:
+        """Отмечает успешный ответ. Возвращает True, если состояние изменилось."""
+        changed = self.state != CLOSED
+        self.state = CLOSED
+        self.failures = 0
+        return changed
+
+    def record_failure(self) -> bool:
+        """Отмечает ошибку. Возвращает True, если цепь разомкнулась."""
+        self.failures += 1
+        if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+            return True
+        return False
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'state': self.state,
+            'failures': self.failures,
+            'rejected': self.rejected,
+            'open_for': round(time.monotonic() - self.opened_at, 1) if self.state != CLOSED else 0.0,
+            'updated_at': time.time(),
+        }
+
+
+def create_circuit_breaker():
+    """Создает предохранитель по настройкам (None, если TMDB_BREAKER_FAILURES = 0)."""
+    if settings.TMDB_BREAKER_FAILURES <= 0:
+        return None
+    return CircuitBreaker(settings.TMDB_BREAKER_FAILURES, settings.TMDB_BREAKER_RECOVERY)
+
+
+async def publish_circuit_state(breaker: CircuitBreaker):
+    """Сохраняет состояние предохранителя процесса в Redis, чтобы API мог показать его для всех воркеров."""
+    try:
+        await get_redis().hset(STATES_KEY, f'{socket.gethostname()}:{os.getpid()}', json.dumps(breaker.snapshot()))
+    except RedisError as e:
+        print(f"⚠️ Circuit state is not published: {e}")
+
+
+async def load_circuit_states() -> List[Dict[str, Any]]:
+    """Последние известные состояния предохранителей всех процессов, свежие первыми."""
+    try:
+        raw = await get_redis().hgetall(STATES_KEY)
+        states = [{'process': process, **json.loads(value)} for process, value in raw.items()]
+        stale = [state['process'] for state in states if time.time() - state['updated_at'] > STATE_STALE_AFTER]
+        if stale:
+            await get_redis().hdel(STATES_KEY, *stale)
+    except RedisError as e:
+        print(f"⚠️ Circuit states unavailable: {e}")
+        return []
+    return sorted((state for state in states if state['process'] not in stale),
+                  key=lambda state: state['updated_at'], reverse=True)
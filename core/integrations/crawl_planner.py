@@ -0,0 +1,92 @@
+import json
+import time
+from dataclasses import dataclass, asdict
+from typing import Dict, List
+
+from redis.exceptions import RedisError
+
+from core.config import settings
+from core.redis import get_redis
+
+# page -> PageYield в JSON: сколько новых фильмов страница популярного приносит за обход
+YIELD_KEY = 'tmdb:crawl:yield'
+
+
+@dataclass
+class PageYield:
+    """История страницы популярного: сглаженное число новых фильмов за обход и время последнего обхода."""
+    ewma: float
+    crawls: int
+    last_crawled: float
+
+    def is_productive(self) -> bool:
+        return self.ewma >= settings.CRAWL_MIN_YIELD
+
+    def updated(self, new_movies: int, now: float) -> 'PageYield':
+        alpha = settings.CRAWL_YIELD_ALPHA
+        return PageYield(ewma=alpha * new_movies + (1 - alpha) * self.ewma,
+                         crawls=self.crawls + 1,
+                         last_crawled=now)
+
+
+def plan_pages(history: Dict[int, PageYield], start_page: int, end_page: int, now: float) -> List[int]:
+    """
+    Выбирает страницы для обхода диапазона по истории их отдачи.
+
+    Страница обходится, если ее еще не обходили или она приносит новые фильмы. Пустые страницы
+    пропускаются и перепроверяются раз в CRAWL_DEAD_RECHECK_HOURS. Пока последние
+    CRAWL_FRONTIER_WINDOW страниц диапазона продолжают приносить новое, диапазон расширяется
+    на CRAWL_FRONTIER_STEP страниц (не дальше TMDB_MAX_POPULAR_PAGE).
+    """
+    recheck_after = settings.CRAWL_DEAD_RECHECK_HOURS * 3600
+    window = settings.CRAWL_FRONTIER_WINDOW
+
+    while end_page < settings.TMDB_MAX_POPULAR_PAGE:
+        tail = [history.get(page) for page in range(max(start_page, end_page - window + 1), end_page + 1)]
+        if not all(page_yield and page_yield.is_productive() for page_yield in tail):
+            break
+        end_page = min(end_page + settings.CRAWL_FRONTIER_STEP, settings.TMDB_MAX_POPULAR_PAGE)
+
+    pages = []
+    for page in range(start_page, end_page + 1):
+        page_yield = history.get(page)
+        if page_yield is None or page_yield.is_productive() or now - page_yield.last_crawled >= recheck_after:
+            pages.append(page)
+    return pages
+
+
+async def load_page_history() -> Dict[int, PageYield]:
+    """Читает историю отдачи страниц. Без Redis история пустая, и обходится весь диапазон."""
+    try:
+        raw = await get_redis().hgetall(YIELD_KEY)
+    except RedisError as e:
+        print(f"⚠️ Crawl history unavailable: {e}")
+        return {}
+    return {int(page): PageYield(**json.loads(value)) for page, value in raw.items()}
+
+
+async def plan_crawl_pages(start_page: int, end_page: int) -> List[int]:
+    """Возвращает страницы диапазона (возможно, расширенного), которые стоит обойти сейчас."""
+    pages = plan_pages(await load_page_history(), start_page, end_page, time.time())
+    print(f"🧭 Crawl plan for pages {start_page}-{end_page}: {len(pages)} pages, "
+          f"{pages[0] if pages else '-'}..{pages[-1] if pages else '-'}.")
+    return pages
+
+
+async def record_page_yields(new_movies_by_page: Dict[int, int]):
+    """Добавляет к истории страниц число новых фильмов, найденных на каждой в этом обходе."""
+    if not new_movies_by_page:
+        return
+    pages = list(new_movies_by_page)
+    now = time.time()
+    try:
+        previous = await get_redis().hmget(YIELD_KEY, pages)
+        updated = {}
+        for page, raw in zip(pages, previous):
+            new_movies = new_movies_by_page[page]
+            page_yield = PageYield(**json.loads(raw)).updated(new_movies, now) if raw \
+                else PageYield(float(new_movies), 1, now)
+            updated[page] = json.dumps(asdict(page_yield))
+        await get_redis().hset(YIELD_KEY, mapping=updated)
+    except RedisError as e:
+        print(f"⚠️ Crawl history unavailable: {e}")
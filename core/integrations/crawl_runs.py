@@ -0,0 +1,88 @@
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+from redis.exceptions import RedisError
+
+from core.config import settings
+from core.redis import get_redis
+
+RUN_KEY_PREFIX = 'tmdb:crawl:run:'
+# run_id по времени запуска, для списка последних обходов
+RUNS_INDEX_KEY = 'tmdb:crawl:runs'
+
+STATUS_RUNNING = 'running'
+STATUS_FINISHED = 'finished'
+STATUS_FAILED = 'failed'
+
+
+def _decode_run(run_id: str, raw: Dict[str, str]) -> Dict[str, Any]:
+    return {
+        'run_id': run_id,
+        'status': raw['status'],
+        'pages': json.loads(raw['pages']),
+        'cursor': int(raw['cursor']),
+        'stats': json.loads(raw['stats']),
+        'started_at': float(raw['started_at']),
+        'updated_at': float(raw['updated_at']),
+    }
+
+
+async def load_crawl_run(run_id: str) -> Optional[Dict[str, Any]]:
+    """Возвращает состояние обхода: страницы, курсор (сколько страниц пройдено), счетчики и статус."""
+    try:
+        raw = await get_redis().hgetall(f'{RUN_KEY_PREFIX}{run_id}')
+    except RedisError as e:
+        print(f"⚠️ Crawl runs unavailable: {e}")
+        return None
+    return _decode_run(run_id, raw) if raw else None
+
+
+async def list_crawl_runs(limit: int = 20) -> List[Dict[str, Any]]:
+    """Последние обходы, новые первыми."""
+    try:
+        run_ids = await get_redis().zrevrange(RUNS_INDEX_KEY, 0, limit - 1)
+    except RedisError as e:
+        print(f"⚠️ Crawl runs unavailable: {e}")
+        return []
+    runs = [await load_crawl_run(run_id) for run_id in run_ids]
+    return [run for run in runs if run]
+
+
+async def save_crawl_run(run: Dict[str, Any]):
+    """Сохраняет состояние обхода; вызывается после каждой пройденной группы страниц."""
+    run['updated_at'] = time.time()
+    key = f"{RUN_KEY_PREFIX}{run['run_id']}"
+    try:
+        async with get_redis().pipeline(transaction=True) as pipe:
+            pipe.hset(key, mapping={
+                'status': run['status'],
+                'pages': json.dumps(run['pages']),
+                'cursor': run['cursor'],
+                'stats': json.dumps(run['stats']),
+                'started_at': run['started_at'],
+                'updated_at': run['updated_at'],
+            })
+            pipe.expire(key, settings.CRAWL_RUN_TTL)
+            pipe.zadd(RUNS_INDEX_KEY, {run['run_id']: run['started_at']})
+            # Индекс чистим вместе с истекшими обходами
+            pipe.zremrangebyscore(RUNS_INDEX_KEY, '-inf', time.time() - settings.CRAWL_RUN_TTL)
+            await pipe.execute()
+    except RedisError as e:
+        print(f"⚠️ Crawl runs unavailable, progress of {run['run_id']} is not saved: {e}")
+
+
+async def start_crawl_run(run_id: str, pages: List[int], stats: Dict[str, int]) -> Dict[str, Any]:
+    """
+    Начинает обход или продолжает прерванный с тем же run_id.
+    При продолжении страницы и счетчики берутся из сохраненного состояния, а не из аргументов.
+    """
+    run = await load_crawl_run(run_id)
+    if run and run['status'] == STATUS_RUNNING:
+        print(f"♻️ Resuming crawl {run_id} from page {run['cursor'] + 1}/{len(run['pages'])}.")
+        return run
+
+    run = {'run_id': run_id, 'status': STATUS_RUNNING, 'pages': pages, 'cursor': 0,
+           'stats': stats, 'started_at': time.time(), 'updated_at': time.time()}
+    await save_crawl_run(run)
+    return run
@@ -0,0 +1,82 @@
+import os
+import socket
+from typing import List
+
+from redis.exceptions import RedisError
+
+from core.config import settings
+from core.redis import get_redis
+
+QUEUED_PREFIX = 'tmdb:import:queued:'
+RUNNING_PREFIX = 'tmdb:import:running:'
+
+# Снимаем блокировку, только если она все еще наша (могла истечь и достаться другому воркеру)
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def get_lock_owner() -> str:
+    """Идентификатор процесса-владельца блокировки импорта."""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+async def _set_if_absent(prefix: str, tmdb_movie_ids: List[int], value: str, ttl: int) -> List[int]:
+    """
+    Ставит ключ prefix+id для каждого фильма, если его еще нет, и возвращает id, для которых удалось.
+    Без Redis дедупликация отключается: возвращаются все id.
+    """
+    if not tmdb_movie_ids:
+        return []
+    try:
+        async with get_redis().pipeline(transaction=False) as pipe:
+            for tmdb_movie_id in tmdb_movie_ids:
+                pipe.set(f'{prefix}{tmdb_movie_id}', value, nx=True, ex=ttl)
+            results = await pipe.execute()
+    except RedisError as e:
+        print(f"⚠️ Import registry unavailable, duplicates are not suppressed: {e}")
+        return list(tmdb_movie_ids)
+    return [tmdb_movie_id for tmdb_movie_id, claimed in zip(tmdb_movie_ids, results) if claimed]
+
+
+async def claim_for_dispatch(tmdb_movie_ids: List[int]) -> List[int]:
+    """
+    Отмечает фильмы как поставленные в очередь импорта и возвращает только те,
+    которые еще не стоят в очереди и не импортировались за последние IMPORT_DEDUP_TTL секунд.
+    """
+    return await _set_if_absent(QUEUED_PREFIX, tmdb_movie_ids, '1', settings.IMPORT_DEDUP_TTL)
+
+
+async def forget_dispatch(tmdb_movie_ids: List[int]):
+    """Снимает отметку об очереди (импорт не удался), чтобы фильм можно было поставить снова."""
+    if not tmdb_movie_ids:
+        return
+    try:
+        await get_redis().delete(*(f'{QUEUED_PREFIX}{tmdb_movie_id}' for tmdb_movie_id in tmdb_movie_ids))
+    except RedisError as e:
+        print(f"⚠️ Import registry unavailable: {e}")
+
+
+async def acquire_import_locks(tmdb_movie_ids: List[int]) -> List[int]:
+    """
+    Захватывает фильмы для импорта в этом процессе и возвращает захваченные.
+    Фильмы, которые прямо сейчас импортирует другой воркер, в результат не попадают.
+    """
+    return await _set_if_absent(RUNNING_PREFIX, tmdb_movie_ids, get_lock_owner(), settings.IMPORT_LOCK_TTL)
+
+
+async def release_import_locks(tmdb_movie_ids: List[int]):
+    """Освобождает фильмы, захваченные acquire_import_locks."""
+    if not tmdb_movie_ids:
+        return
+    owner = get_lock_owner()
+    try:
+        async with get_redis().pipeline(transaction=False) as pipe:
+            for tmdb_movie_id in tmdb_movie_ids:
+                pipe.eval(RELEASE_LOCK_SCRIPT, 1, f'{RUNNING_PREFIX}{tmdb_movie_id}', owner)
+            await pipe.execute()
+    except RedisError as e:
+        print(f"⚠️ Import registry unavailable: {e}")
@@ -1,70 +1,91 @@
-from datetime import date, datetime
+from datetime import date
 from decimal import Decimal
-from typing import List, Optional, Any, Dict
+from typing import Optional, Any, Dict
 from core.schemas.movies import MovieCreate
 from core.models.movies import MediaType
 
+TRAILER_LANGUAGES = ('ru', 'en')
 
 
+def extract_trailer_key(tmdb_videos: Optional[Dict[str, Any]]) -> Optional[str]:
+    """
+    Выбирает ключ YouTube трейлера из блока videos ответа TMDb.
+    Русский трейлер в приоритете, затем английский.
+    """
+    if not tmdb_videos or not tmdb_videos.get('results'):
+        return None
 
+    trailers = [video for video in tmdb_videos['results']
+                if video.get('site') == 'YouTube' and video.get('type') == 'Trailer']
+    for lang in TRAILER_LANGUAGES:
+        for video in trailers:
+            if video.get('iso_639_1') == lang:
+                return video.get('key')
+    return trailers[0].get('key') if trailers else None
 
-def transform_tmdb_movie(tmdb_data: Dict[str, Any]) -> Optional[MovieCreate]:
+
+def check_length(value: Optional[str], field: str, min_length: int, max_length: int):
+    """Проверка длины строки с теми же границами, что в Pydantic-схемах."""
+    if value is not None and not min_length <= len(value) <= max_length:
+        raise ValueError(f"{field}: length {len(value)} is outside {min_length}..{max_length}")
+
+
+def movie_insert_params(tmdb_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     """
-    Преобразует JSON от TMDb в схему MovieCreate, очищая и маппируя поля.
+    Преобразует JSON фильма TMDb сразу в параметры для Movie(**params), без промежуточной схемы.
+    Ограничения полей те же, что у MovieCreate; при нарушении — ValueError.
     """
     if not tmdb_data or 'id' not in tmdb_data:
         return None
     release_date_str = tmdb_data.get('release_date') or tmdb_data.get('first_air_date', '')
 
     release_date_obj: date | None = None
-
+    release_year = 0
     if release_date_str:
         try:
-            release_datetime = datetime.strptime(release_date_str, '%Y-%m-%d')
-            release_date_obj = release_datetime.date()
+            release_date_obj = date.fromisoformat(release_date_str)
         except ValueError:
             pass
-
-    if release_date_str and release_date_str != '':
         release_year = int(release_date_str.split('-')[0])
-    else:
-        release_year = 0
 
     raw_budget = tmdb_data.get('budget')
-    budget_decimal = Decimal(raw_budget) if isinstance(raw_budget, int) and raw_budget > 0 else None
     raw_revenue = tmdb_data.get('revenue')
-    revenue_decimal = Decimal(raw_revenue) if isinstance(raw_revenue, int) and raw_revenue > 0 else None
 
     media_type_str = tmdb_data.get('media_type') or ('tv' if tmdb_data.get('first_air_date') else 'movie')
-
     try:
         media_type = MediaType(media_type_str)
     except ValueError:
         media_type = MediaType.MOVIE
 
-    rating = tmdb_data.get('vote_average') or 0.0
-    popularity = tmdb_data.get('popularity') or 0.0
-    runtime = tmdb_data.get('runtime') or None
-    poster_path = tmdb_data.get('poster_path') or None
+    title = tmdb_data.get('title') or tmdb_data.get('name', 'N/A')
+    description = tmdb_data.get('overview') or None
+    check_length(title, 'title', 3, 100)
+    check_length(description, 'description', 0, 2000)
 
-    genres_ids = [g['id'] for g in tmdb_data.get('genres', []) if isinstance(g, dict) and 'id' in g]
-    return MovieCreate(
-        tmdb_id=tmdb_data['id'],
-        title=tmdb_data.get('title') or tmdb_data.get('name', 'N/A'),
+    return {
+        'tmdb_id': tmdb_data['id'],
+        'title': title,
+        'media_type': media_type,
+        'release_year': release_year,
+        'release_date': release_date_obj,
+        'budget': Decimal(raw_budget) if isinstance(raw_budget, int) and raw_budget > 0 else None,
+        'revenue': Decimal(raw_revenue) if isinstance(raw_revenue, int) and raw_revenue > 0 else None,
+        'description': description,
+        'tagline': tmdb_data.get('tagline') or None,
+        'runtime_minutes': tmdb_data.get('runtime') or None,
+        'rating': tmdb_data.get('vote_average') or 0.0,
+        'popularity': tmdb_data.get('popularity') or 0.0,
+        'poster_path': tmdb_data.get('poster_path') or None,
+        'trailer_url': extract_trailer_key(tmdb_data.get('videos')),
+    }
 
-        # Наши типы
-        media_type=media_type,
-        release_year=release_year,
-        release_date = release_date_obj,
 
-        # Опциональные поля
-        budget = budget_decimal,
-        revenue = revenue_decimal,
-        description=tmdb_data.get('overview') or None,
-        tagline=tmdb_data.get('tagline') or None,
-        runtime_minutes=runtime,
-        rating=rating,
-        popularity=popularity,
-        poster_path=poster_path,
-        trailer_url=None
-    )
+def transform_tmdb_movie(tmdb_data: Dict[str, Any]) -> Optional[MovieCreate]:
+    """
+    Преобразует JSON от TMDb в схему MovieCreate, очищая и маппируя поля.
+    """
+    params = movie_insert_params(tmdb_data)
+    if params is None:
+        return None
+    genres_ids = [g['id'] for g in tmdb_data.get('genres', []) if isinstance(g, dict) and 'id' in g]
+    return MovieCreate(**params, genres_ids=genres_ids)
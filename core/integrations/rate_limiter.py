@@ -0,0 +1,104 @@
+import asyncio
+import time
+from typing import Optional
+
+from redis.exceptions import RedisError
+
+from core.config import settings
+from core.redis import get_redis
+
+
+class LocalRateLimiter:
+    """
+    Token bucket в памяти процесса: общий для всех корутин, работающих с TMDb.
+
+    Токены можно брать в долг: корутина резервирует слот и спит, пока долг не погасится,
+    поэтому блокировка не нужна и порядок запросов сохраняется.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        """Ждет, пока можно будет отправить следующий запрос."""
+        self._refill()
+        self._tokens -= 1
+        if self._tokens < 0:
+            await asyncio.sleep(-self._tokens / self.rate)
+
+    async def pause(self, seconds: float):
+        """Притормаживает все последующие запросы (TMDb ответил 429)."""
+        self._refill()
+        self._tokens = min(self._tokens, 0) - seconds * self.rate
+
+
+# Резервирование токена и учет паузы после 429 атомарно на стороне Redis.
+# Время берется из TIME сервера, чтобы часы разных воркеров не влияли на лимит.
+ACQUIRE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + (now - ts) * rate) - 1
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], 60)
+local wait = 0
+if tokens < 0 then wait = -tokens / rate end
+local paused = redis.call('PTTL', KEYS[2])
+if paused > 0 then wait = math.max(wait, paused / 1000) end
+return tostring(wait)
+"""
+
+
+class RedisRateLimiter:
+    """
+    Token bucket в Redis: один лимит на все процессы API и воркеров.
+    Если Redis недоступен, лимит соблюдается хотя бы в пределах процесса.
+    """
+
+    def __init__(self, rate: float, burst: int, key: str = 'tmdb:rate_limit'):
+        self.rate = rate
+        self.burst = burst
+        self.key = key
+        self.pause_key = f'{key}:pause'
+        self.fallback = LocalRateLimiter(rate, burst)
+
+    async def acquire(self):
+        """Ждет, пока можно будет отправить следующий запрос."""
+        try:
+            wait = float(await get_redis().eval(ACQUIRE_SCRIPT, 2, self.key, self.pause_key,
+                                                self.rate, self.burst))
+        except RedisError as e:
+            print(f"⚠️ Redis rate limiter unavailable, using local limit: {e}")
+            await self.fallback.acquire()
+            return
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    async def pause(self, seconds: float):
+        """Притормаживает запросы всех процессов (TMDb ответил 429)."""
+        await self.fallback.pause(seconds)
+        try:
+            await get_redis().set(self.pause_key, 1, px=max(int(seconds * 1000), 1))
+        except RedisError as e:
+            print(f"⚠️ Redis rate limiter unavailable, pause is local only: {e}")
+
+
+def create_rate_limiter() -> Optional[LocalRateLimiter | RedisRateLimiter]:
+    """Создает лимитер запросов к TMDb по настройкам (None, если лимит выключен)."""
+    if settings.TMDB_RATE_LIMIT <= 0:
+        return None
+    if settings.TMDB_RATE_LIMIT_BACKEND == 'redis':
+        return RedisRateLimiter(settings.TMDB_RATE_LIMIT, settings.TMDB_RATE_BURST)
+    return LocalRateLimiter(settings.TMDB_RATE_LIMIT, settings.TMDB_RATE_BURST)
@@ -0,0 +1,185 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+from dataclasses import dataclass, asdict
+from typing import Optional
+
+import httpx
+from redis.exceptions import RedisError
+
+from core.config import settings
+from core.redis import get_redis
+
+MAX_AGE_RE = re.compile(r'max-age=(\d+)')
+
+
+@dataclass
+class CacheEntry:
+    """Закэшированный ответ TMDb вместе с валидаторами."""
+    body: str
+    etag: Optional[str]
+    expires_at: float
+
+    @property
+    def is_fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+    def to_response(self, request: httpx.Request) -> httpx.Response:
+        """Собирает из записи ответ, неотличимый для вызывающего кода от сетевого."""
+        headers = {'content-type': 'application/json'}
+        if self.etag:
+            headers['etag'] = self.etag
+        return httpx.Response(200, content=self.body.encode(), headers=headers, request=request)
+
+    def dumps(self) -> str:
+        return json.dumps(asdict(self), ensure_ascii=False)
+
+    @classmethod
+    def loads(cls, raw: Optional[str]) -> Optional['CacheEntry']:
+        return cls(**json.loads(raw)) if raw else None
+
+
+def get_max_age(response: httpx.Response) -> Optional[int]:
+    """
+    Возвращает срок свежести ответа из Cache-Control.
+    None означает, что ответ кэшировать нельзя.
+    """
+    cache_control = response.headers.get('cache-control', '').lower()
+    if 'no-store' in cache_control:
+        return None
+    match = MAX_AGE_RE.search(cache_control)
+    if match:
+        return int(match.group(1))
+    # Без max-age, но с ETag: храним и каждый раз перепроверяем
+    return 0 if response.headers.get('etag') else None
+
+
+def make_cache_key(endpoint: str, params: dict) -> str:
+    raw = endpoint + '?' + '&'.join(f'{k}={params[k]}' for k in sorted(params))
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+# Запись и вытеснение самых давно прочитанных записей при превышении лимита размера
+REDIS_SET_SCRIPT = """
+local old = tonumber(redis.call('HGET', KEYS[3], KEYS[1])) or 0
+local size = string.len(ARGV[1])
+redis.call('SET', KEYS[1], ARGV[1])
+redis.call('HSET', KEYS[3], KEYS[1], size)
+redis.call('ZADD', KEYS[2], ARGV[2], KEYS[1])
+local total = redis.call('INCRBY', KEYS[4], size - old)
+while total > tonumber(ARGV[3]) do
+    local oldest = redis.call('ZPOPMIN', KEYS[2])
+    if #oldest == 0 then break end
+    local evicted = tonumber(redis.call('HGET', KEYS[3], oldest[1])) or 0
+    redis.call('DEL', oldest[1])
+    redis.call('HDEL', KEYS[3], oldest[1])
+    total = redis.call('DECRBY', KEYS[4], evicted)
+end
+return total
+"""
+
+
+class RedisCacheBackend:
+    """
+    Кэш ответов TMDb в Redis, общий для всех процессов.
+    Порядок чтения хранится в sorted set, по нему вытесняются записи сверх max_bytes.
+    """
+
+    def __init__(self, max_bytes: int, prefix: str = 'tmdb:cache'):
+        self.max_bytes = max_bytes
+        self.prefix = prefix
+        self.lru_key = f'{prefix}:lru'
+        self.sizes_key = f'{prefix}:sizes'
+        self.total_key = f'{prefix}:total'
+
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        redis_key = f'{self.prefix}:{key}'
+        try:
+            raw = await get_redis().get(redis_key)
+            if raw is not None:
+                await get_redis().zadd(self.lru_key, {redis_key: time.time()})
+        except RedisError as e:
+            print(f"⚠️ TMDB cache unavailable: {e}")
+            return None
+        return CacheEntry.loads(raw)
+
+    async def set(self, key: str, entry: CacheEntry):
+        try:
+            await get_redis().eval(REDIS_SET_SCRIPT, 4,
+                                   f'{self.prefix}:{key}', self.lru_key, self.sizes_key, self.total_key,
+                                   entry.dumps(), time.time(), self.max_bytes)
+        except RedisError as e:
+            print(f"⚠️ TMDB cache unavailable: {e}")
+
+
+class DiskCacheBackend:
+    """
+    Кэш ответов TMDb в файлах на диске (по файлу на запись).
+    Время последнего чтения — mtime файла, по нему вытесняются записи сверх max_bytes.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        # Примерный объем кэша: пересчитывается сканированием только при вытеснении
+        self._total = self._evict()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f'{key}.json')
+
+    def _read(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                raw = f.read()
+            os.utime(path)
+            return raw
+        except FileNotFoundError:
+            return None
+
+    def _write(self, key: str, raw: str):
+        path = self._path(key)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(raw)
+        os.replace(tmp_path, path)
+        self._total += len(raw.encode())
+        if self._total > self.max_bytes:
+            self._total = self._evict()
+
+    def _evict(self) -> int:
+        """Удаляет самые давно прочитанные файлы, пока кэш не уложится в лимит. Возвращает объем."""
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.json'):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        return total
+
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        return CacheEntry.loads(await asyncio.to_thread(self._read, key))
+
+    async def set(self, key: str, entry: CacheEntry):
+        await asyncio.to_thread(self._write, key, entry.dumps())
+
+
+def create_cache_backend():
+    """Создает хранилище кэша ответов TMDb по настройкам (None, если кэш выключен)."""
+    if settings.TMDB_CACHE_BACKEND == 'redis':
+        return RedisCacheBackend(settings.TMDB_CACHE_MAX_BYTES)
+    if settings.TMDB_CACHE_BACKEND == 'disk':
+        return DiskCacheBackend(settings.TMDB_CACHE_DIR, settings.TMDB_CACHE_MAX_BYTES)
+    return None
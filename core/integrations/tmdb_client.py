@@ -1,11 +1,19 @@
-import pprint
+import asyncio
+import importlib.util
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 
 import httpx
+import orjson
 
 from core.config import settings
+from core.integrations.circuit_breaker import create_circuit_breaker, publish_circuit_state
+from core.integrations.rate_limiter import create_rate_limiter
+from core.integrations.tmdb_cache import CacheEntry, create_cache_backend, get_max_age, make_cache_key
 from typing import Dict, Any, Optional
 
-BASE_URL = "https://api.themoviedb.org/3"
+BASE_URL = settings.TMDB_BASE_URL
 
 HEADERS = {
     "Authorization": f"Bearer {settings.TMDB_API_KEY}",
@@ -14,43 +22,252 @@ HEADERS = {
 
 params = {'language': 'ru-RU'}
 
+# HTTP/2 включаем только если установлен пакет h2, иначе httpx падает при создании клиента
+HTTP2_AVAILABLE = importlib.util.find_spec('h2') is not None
 
-async def fetch_tmdb_data(endpoint: str, params: dict = None) -> Optional[Dict[str, Any]]:
+MAX_RETRY_DELAY = 60.0
+
+
+def get_retry_delay(response: httpx.Response, attempt: int) -> float:
     """
-    Асинхронно выполняет GET-запрос к TMDb.
+    Возвращает паузу перед повтором после 429: по заголовку Retry-After (секунды или HTTP-дата),
+    а если его нет, экспоненциально по номеру попытки.
+    """
+    retry_after = response.headers.get('Retry-After')
+    if retry_after:
+        try:
+            return min(max(float(retry_after), 0.0), MAX_RETRY_DELAY)
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(retry_after)
+            delay = (retry_at - datetime.now(timezone.utc)).total_seconds()
+            return min(max(delay, 0.0), MAX_RETRY_DELAY)
+        except (TypeError, ValueError):
+            pass
+    return min(2.0 ** attempt, MAX_RETRY_DELAY)
+
+
+def get_endpoint_timeout(endpoint: str, default: float) -> float:
+    """Таймаут запроса по самому длинному совпавшему префиксу из TMDB_ENDPOINT_TIMEOUTS."""
+    prefixes = [prefix for prefix in settings.TMDB_ENDPOINT_TIMEOUTS if endpoint.startswith(prefix)]
+    return settings.TMDB_ENDPOINT_TIMEOUTS[max(prefixes, key=len)] if prefixes else default
+
+
+class TMDBClient:
+    """
+    Долгоживущий клиент TMDb с пулом keep-alive соединений.
+
+    Открывается один раз на процесс (lifespan API или воркер Celery) и закрывается при остановке,
+    поэтому все запросы интеграции переиспользуют уже установленные TCP/TLS соединения.
     """
-    url = f"{BASE_URL}{endpoint}"
 
-    # Создаем копию базовых параметров, чтобы не мутировать глобальную переменную
-    # и подмешиваем новые параметры, если они переданы
-    request_params = {'language': 'ru-RU'}
-    if params:
-        request_params.update(params)
+    def __init__(self,
+                 base_url: str = BASE_URL,
+                 headers: Optional[Dict[str, str]] = None,
+                 timeout: float = settings.TMDB_TIMEOUT,
+                 transport: Optional[httpx.AsyncBaseTransport] = None,
+                 rate_limiter=None,
+                 cache=None,
+                 max_retries: int = settings.TMDB_MAX_RETRIES,
+                 circuit_breaker=None,
+                 hedge_after: float = settings.TMDB_HEDGE_AFTER):
+        self.base_url = base_url
+        self.headers = headers if headers is not None else HEADERS
+        self.timeout = timeout
+        self.transport = transport
+        self.rate_limiter = rate_limiter
+        self.cache = cache
+        self.max_retries = max_retries
+        self.circuit_breaker = circuit_breaker
+        self.hedge_after = hedge_after
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def is_open(self) -> bool:
+        return self._client is not None and not self._client.is_closed
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        """
+        Возвращает открытый httpx-клиент, создавая его при первом обращении.
+        """
+        if not self.is_open:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=self.headers,
+                timeout=self.timeout,
+                http2=HTTP2_AVAILABLE,
+                transport=self.transport,
+                limits=httpx.Limits(
+                    max_connections=settings.TMDB_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.TMDB_MAX_CONNECTIONS,
+                    keepalive_expiry=settings.TMDB_KEEPALIVE_EXPIRY,
+                ),
+            )
+        return self._client
+
+    async def open(self) -> 'TMDBClient':
+        """Открывает пул соединений (повторный вызов ничего не делает)."""
+        _ = self.http
+        return self
+
+    async def close(self):
+        """Закрывает пул соединений."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def __aenter__(self) -> 'TMDBClient':
+        return await self.open()
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def get(self, endpoint: str, params: dict = None) -> httpx.Response:
+        """
+        Выполняет GET-запрос к TMDb. Язык ru-RU подмешивается по умолчанию.
+
+        Если подключен кэш, свежий ответ отдается без сети, а устаревший
+        перепроверяется условным запросом с If-None-Match.
+        """
+        # Создаем копию базовых параметров, чтобы не мутировать глобальную переменную
+        # и подмешиваем новые параметры, если они переданы
+        request_params = {'language': 'ru-RU'}
+        if params:
+            request_params.update(params)
+
+        if self.cache is None:
+            return await self._send(endpoint, request_params)
+
+        key = make_cache_key(endpoint, request_params)
+        entry = await self.cache.get(key)
+        if entry and entry.is_fresh:
+            return entry.to_response(self.http.build_request('GET', endpoint, params=request_params))
+
+        headers = {'If-None-Match': entry.etag} if entry and entry.etag else None
+        response = await self._send(endpoint, request_params, headers=headers)
+
+        if response.status_code == 304 and entry:
+            entry.expires_at = time.time() + (get_max_age(response) or 0)
+            await self.cache.set(key, entry)
+            return entry.to_response(response.request)
 
-    async with httpx.AsyncClient(headers=HEADERS, timeout=10.0) as client:
+        if response.status_code == 200:
+            max_age = get_max_age(response)
+            if max_age is not None:
+                await self.cache.set(key, CacheEntry(body=response.text,
+                                                     etag=response.headers.get('etag'),
+                                                     expires_at=time.time() + max_age))
+        return response
+
+    async def _send(self, endpoint: str, request_params: dict, headers: dict = None) -> httpx.Response:
+        """
+        Отправляет запрос через общий лимитер. На 429 все запросы притормаживаются
+        на Retry-After, а этот повторяется до max_retries раз.
+        Пока предохранитель разомкнут, запрос сразу завершается CircuitOpenError.
+        """
+        attempt = 0
+        while True:
+            response = await self._guarded_request(endpoint, request_params, headers)
+            if response.status_code != 429 or attempt >= self.max_retries:
+                return response
+
+            delay = get_retry_delay(response, attempt)
+            attempt += 1
+            print(f"[429] TMDB rate limit for {endpoint}, retry {attempt}/{self.max_retries} in {delay:.1f}s")
+            if self.rate_limiter:
+                await self.rate_limiter.pause(delay)
+            await asyncio.sleep(delay)
+
+    async def _guarded_request(self, endpoint: str, request_params: dict, headers: dict = None) -> httpx.Response:
+        """Один запрос через предохранитель: таймауты, сетевые ошибки и 5xx считаются отказами TMDb."""
+        if self.circuit_breaker is None:
+            return await self._request(endpoint, request_params, headers)
+
+        self.circuit_breaker.before_call()
         try:
-            # Используем request_params (базовые + дополнительные)
-            response = await client.get(url, params=request_params)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            # Выводим статус код и часть ответа для отладки
-            print(f"[{e.response.status_code}] HTTP Error for {endpoint}: {e}")
-            return None
-        except Exception as e:
-            print(f"An unexpected error occurred during fetch for {endpoint}: {e}")
-            return None
+            response = await self._request(endpoint, request_params, headers)
+        except httpx.TransportError:
+            await self._record_outcome(failed=True)
+            raise
+        await self._record_outcome(failed=response.status_code >= 500)
+        return response
 
+    async def _record_outcome(self, failed: bool):
+        changed = self.circuit_breaker.record_failure() if failed else self.circuit_breaker.record_success()
+        if changed:
+            print(f"🔌 TMDB circuit is now {self.circuit_breaker.state}.")
+            await publish_circuit_state(self.circuit_breaker)
 
-async def fetch_popular_movie_ids(page: int = 1):
-    """Получает список популярных фильмов с TMDB."""
-    url = f"{BASE_URL}/movie/popular"
-    params = {'language': 'ru-RU',
-              'page': page,}
-    async with httpx.AsyncClient(headers=HEADERS, timeout=10.0) as client:
-        response = await client.get(url, params=params)
+    async def _request(self, endpoint: str, request_params: dict, headers: dict = None) -> httpx.Response:
+        """
+        Отправляет GET с таймаутом эндпоинта. Если задан hedge_after и ответа нет дольше,
+        параллельно отправляется второй такой же запрос, и берется ответ, пришедший первым.
+        """
+        timeout = get_endpoint_timeout(endpoint, self.timeout)
+
+        async def send():
+            if self.rate_limiter:
+                await self.rate_limiter.acquire()
+            return await self.http.get(endpoint, params=request_params, headers=headers, timeout=timeout)
+
+        if not self.hedge_after:
+            return await send()
+
+        pending = {asyncio.ensure_future(send())}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=self.hedge_after)
+            if not done:
+                pending.add(asyncio.ensure_future(send()))
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    # Ошибка одной из копий не важна, пока вторая еще может ответить
+                    if task.exception() is None or not pending:
+                        return task.result()
+            return done.pop().result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+tmdb_client = TMDBClient(rate_limiter=create_rate_limiter(),
+                         cache=create_cache_backend(),
+                         circuit_breaker=create_circuit_breaker())
+
+
+async def fetch_tmdb_data(endpoint: str, params: dict = None) -> Optional[Dict[str, Any]]:
+    """
+    Асинхронно выполняет GET-запрос к TMDb.
+    """
+    try:
+        response = await tmdb_client.get(endpoint, params=params)
         response.raise_for_status()
-        data = response.json()
-        return data
+        return orjson.loads(response.content)
+    except httpx.HTTPStatusError as e:
+        # Выводим статус код и часть ответа для отладки
+        print(f"[{e.response.status_code}] HTTP Error for {endpoint}: {e}")
+        return None
+    except Exception as e:
+        print(f"An unexpected error occurred during fetch for {endpoint}: {e}")
+        return None
 
 
+async def fetch_movie_details(tmdb_movie_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Одним запросом получает детали фильма вместе с видео (ru и en) и актерским составом.
+    Видео и состав лежат в ответе под ключами 'videos' и 'credits'.
+    """
+    return await fetch_tmdb_data(f"/movie/{tmdb_movie_id}", params={
+        'append_to_response': 'videos,credits',
+        'include_video_language': 'ru,en',
+    })
+
+
+async def fetch_popular_movie_ids(page: int = 1):
+    """Получает список популярных фильмов с TMDB."""
+    response = await tmdb_client.get("/movie/popular", params={'page': page})
+    response.raise_for_status()
+    data = orjson.loads(response.content)
+    return data
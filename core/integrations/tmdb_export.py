@@ -0,0 +1,27 @@
+import gzip
+import json
+from typing import Iterator
+
+
+def iter_export_movie_ids(path: str, min_popularity: float = 0.0) -> Iterator[int]:
+    """
+    Потоково читает gzip-файл ежедневной выгрузки TMDb (по JSON-объекту на строку)
+    и возвращает tmdb_id фильмов с популярностью не ниже min_popularity.
+
+    Файл не загружается в память целиком. Фильмы для взрослых, видео-записи
+    и битые строки пропускаются.
+    """
+    with gzip.open(path, 'rt', encoding='utf-8') as export_file:
+        for line in export_file:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError:
+                continue
+            if 'id' not in item or item.get('adult') or item.get('video'):
+                continue
+            if (item.get('popularity') or 0.0) < min_popularity:
+                continue
+            yield item['id']
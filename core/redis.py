@@ -0,0 +1,40 @@
+from typing import Optional
+
+from redis.asyncio import Redis
+
+from core.config import settings
+
+_redis: Optional[Redis] = None
+_broker_redis: Optional[Redis] = None
+
+
+def get_redis() -> Redis:
+    """
+    Возвращает общий для процесса асинхронный клиент Redis, создавая его при первом обращении.
+    """
+    global _redis
+    if _redis is None:
+        _redis = Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _redis
+
+
+def get_broker_redis() -> Redis:
+    """
+    Возвращает клиент Redis брокера Celery (для чтения длины очередей).
+    Если брокер живет в том же Redis, используется общий клиент.
+    """
+    global _broker_redis
+    if settings.CELERY_BROKER_URL == settings.REDIS_URL:
+        return get_redis()
+    if _broker_redis is None:
+        _broker_redis = Redis.from_url(settings.CELERY_BROKER_URL, decode_responses=True)
+    return _broker_redis
+
+
+async def close_redis():
+    """Закрывает пулы соединений Redis."""
+    global _redis, _broker_redis
+    for client in (_redis, _broker_redis):
+        if client is not None:
+            await client.aclose()
+    _redis = _broker_redis = None
@@ -6,6 +6,7 @@ from core.models.users import User, UserRole
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.pool import StaticPool
 from api.main import app
+from api.services.genres import genre_cache
 
 # Настройки БД переезжают сюда или остаются в базовом conftest
 DATABASE_URL = "sqlite+aiosqlite:///:memory:"
@@ -27,6 +28,8 @@ async def cleanup_engine():
 
 @pytest.fixture
 async def db_session():
+    # Таблицы пересоздаются на каждый тест: справочник жанров прошлого теста уже недействителен
+    genre_cache.invalidate()
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
     async with TestingSessionLocal() as session:
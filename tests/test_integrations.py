@@ -1,25 +1,64 @@
 import pytest
-from unittest.mock import patch, AsyncMock
+from unittest.mock import patch, AsyncMock, MagicMock
 from api.services.integrations import import_movie_and_relations
 from http import HTTPStatus
 
 TMDB_FETCH_PATH = "core.integrations.tmdb_client.fetch_tmdb_data"
 
 
+@pytest.fixture(autouse=True)
+def import_registry():
+    """Реестр импорта и история обхода без Redis: все фильмы свободны и ни один не стоит в очереди."""
+    def pass_through(tmdb_movie_ids):
+        return list(tmdb_movie_ids)
+
+    registry = MagicMock(claim_for_dispatch=AsyncMock(side_effect=pass_through),
+                         acquire_import_locks=AsyncMock(side_effect=pass_through),
+                         release_import_locks=AsyncMock(),
+                         forget_dispatch=AsyncMock(),
+                         record_page_yields=AsyncMock(),
+                         wait_for_queue_capacity=AsyncMock(return_value=0.0))
+    with patch("api.services.integrations.claim_for_dispatch", registry.claim_for_dispatch), \
+            patch("api.routers.integrations.claim_for_dispatch", registry.claim_for_dispatch), \
+            patch("api.services.integrations.acquire_import_locks", registry.acquire_import_locks), \
+            patch("api.services.integrations.release_import_locks", registry.release_import_locks), \
+            patch("api.services.integrations.forget_dispatch", registry.forget_dispatch), \
+            patch("api.services.integrations.record_page_yields", registry.record_page_yields), \
+            patch("api.services.integrations.wait_for_queue_capacity", registry.wait_for_queue_capacity):
+        yield registry
+
+
+@pytest.fixture(autouse=True)
+def actor_hydration():
+    """Очередь догрузки актеров без Redis."""
+    queue = MagicMock(queue_actor_hydration=AsyncMock(),
+                      pop_actor_hydration=AsyncMock(return_value=[]),
+                      is_actor_hydration_pending=AsyncMock(return_value=False),
+                      complete_actor_hydration=AsyncMock())
+    with patch("api.services.integrations.queue_actor_hydration", queue.queue_actor_hydration), \
+            patch("api.services.integrations.pop_actor_hydration", queue.pop_actor_hydration), \
+            patch("api.services.integrations.is_actor_hydration_pending", queue.is_actor_hydration_pending), \
+            patch("api.services.integrations.complete_actor_hydration", queue.complete_actor_hydration):
+        yield queue
+
+
 @pytest.mark.asyncio
 async def test_import_movie_logic_direct(db_session):
     # Данные для заглушки (те же, что были)
-    mock_movie = {"id": 100, "title": "Test Movie", "genres": [{"id": 1, "name": "Action"}]}
-    mock_credits = {"cast": [{"id": 50, "character": "Hero"}]}
-    mock_actor = {"id": 50, "name": "John Doe", "biography": "Bio"}
+    mock_credits = {"cast": [{"id": 50, "name": "John Doe", "character": "Hero"}]}
+    mock_videos = {"results": [
+        {"site": "YouTube", "type": "Trailer", "iso_639_1": "en", "key": "en_key"},
+        {"site": "YouTube", "type": "Trailer", "iso_639_1": "ru", "key": "ru_key"},
+    ]}
+    mock_movie = {"id": 100, "title": "Test Movie", "genres": [{"id": 1, "name": "Action"}],
+                  "videos": mock_videos, "credits": mock_credits}
 
     async def side_effect_func(url, **kwargs):
-        if "credits" in url: return mock_credits
         if "movie/100" in url: return mock_movie
-        if "person/50" in url: return mock_actor
         return {}
 
-    with patch("api.services.integrations.fetch_tmdb_data", new_callable=AsyncMock) as mock_fetch:
+    with patch("api.services.integrations.fetch_tmdb_data", new_callable=AsyncMock) as mock_fetch, \
+            patch(TMDB_FETCH_PATH, new=mock_fetch):
         mock_fetch.side_effect = side_effect_func
 
         await import_movie_and_relations(100, session=db_session)
@@ -31,6 +70,640 @@ async def test_import_movie_logic_direct(db_session):
         movie = res.scalar_one_or_none()
         assert movie is not None
         assert movie.title == "Test Movie"
+        assert movie.trailer_url == "ru_key"
+        movie_calls = [c for c in mock_fetch.call_args_list if "movie/" in c.args[0]]
+        assert len(movie_calls) == 1
 
         act_res = await db_session.execute(select(Actor).where(Actor.name == "John Doe"))
-        assert act_res.scalar_one_or_none() is not None
\ No newline at end of file
+        assert act_res.scalar_one_or_none() is not None
+
+async def test_tmdb_client_reuses_pooled_connection():
+    import httpx
+    from core.integrations.tmdb_client import TMDBClient
+
+    requested = []
+
+    def handler(request: httpx.Request):
+        requested.append((request.url.path, request.url.params.get('language')))
+        return httpx.Response(HTTPStatus.OK, json={"id": 1})
+
+    tmdb = TMDBClient(base_url="http://tmdb.test/3", transport=httpx.MockTransport(handler))
+    async with tmdb:
+        http = tmdb.http
+        await tmdb.get("/movie/1")
+        await tmdb.get("/person/2", params={"language": "en-US"})
+        assert tmdb.http is http
+
+    assert not tmdb.is_open
+    assert requested == [("/3/movie/1", "ru-RU"), ("/3/person/2", "en-US")]
+
+
+async def test_tmdb_client_retries_after_429():
+    import httpx
+    from core.integrations.rate_limiter import LocalRateLimiter
+    from core.integrations.tmdb_client import TMDBClient
+
+    responses = [
+        httpx.Response(HTTPStatus.TOO_MANY_REQUESTS, headers={"Retry-After": "0"}),
+        httpx.Response(HTTPStatus.OK, json={"id": 1}),
+    ]
+
+    def handler(request: httpx.Request):
+        return responses.pop(0)
+
+    tmdb = TMDBClient(base_url="http://tmdb.test/3",
+                      transport=httpx.MockTransport(handler),
+                      rate_limiter=LocalRateLimiter(rate=100, burst=5))
+    async with tmdb:
+        response = await tmdb.get("/movie/1")
+
+    assert response.status_code == HTTPStatus.OK
+    assert responses == []
+
+
+async def test_tmdb_client_circuit_breaker_fails_fast():
+    import httpx
+    from core.integrations.circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED, OPEN
+    from core.integrations.tmdb_client import TMDBClient
+
+    statuses = iter([HTTPStatus.INTERNAL_SERVER_ERROR, HTTPStatus.INTERNAL_SERVER_ERROR, HTTPStatus.OK])
+    sent = []
+
+    def handler(request: httpx.Request):
+        sent.append(request.url.path)
+        return httpx.Response(next(statuses), json={})
+
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=60)
+    tmdb = TMDBClient(base_url="http://tmdb.test/3", transport=httpx.MockTransport(handler),
+                      circuit_breaker=breaker)
+    with patch("core.integrations.tmdb_client.publish_circuit_state", new_callable=AsyncMock):
+        async with tmdb:
+            await tmdb.get("/movie/1")
+            await tmdb.get("/movie/1")
+            assert breaker.state == OPEN
+            with pytest.raises(CircuitOpenError):
+                await tmdb.get("/movie/1")
+            assert len(sent) == 2
+
+            # Пробный запрос после recovery_timeout замыкает цепь
+            breaker.opened_at -= 60
+            response = await tmdb.get("/movie/1")
+
+    assert response.status_code == HTTPStatus.OK
+    assert breaker.state == CLOSED
+
+
+async def test_tmdb_client_hedges_slow_request():
+    import asyncio
+    import httpx
+    from core.integrations.tmdb_client import TMDBClient
+
+    calls = 0
+
+    async def handler(request: httpx.Request):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            await asyncio.sleep(5)
+        return httpx.Response(HTTPStatus.OK, json={"call": calls})
+
+    tmdb = TMDBClient(base_url="http://tmdb.test/3", transport=httpx.MockTransport(handler), hedge_after=0.05)
+    async with tmdb:
+        response = await asyncio.wait_for(tmdb.get("/movie/1"), timeout=1)
+
+    assert response.json() == {"call": 2}
+
+
+async def test_local_rate_limiter_spaces_requests():
+    import time
+    from core.integrations.rate_limiter import LocalRateLimiter
+
+    limiter = LocalRateLimiter(rate=20, burst=1)
+    started = time.monotonic()
+    for _ in range(3):
+        await limiter.acquire()
+
+    assert time.monotonic() - started >= 0.09
+
+
+async def test_tmdb_client_revalidates_cached_response(tmp_path):
+    import httpx
+    from core.integrations.tmdb_cache import DiskCacheBackend
+    from core.integrations.tmdb_client import TMDBClient
+
+    sent_etags = []
+
+    def handler(request: httpx.Request):
+        sent_etags.append(request.headers.get("If-None-Match"))
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(HTTPStatus.NOT_MODIFIED, headers={"ETag": '"v1"', "Cache-Control": "max-age=60"})
+        return httpx.Response(HTTPStatus.OK, json={"id": 1, "vote_average": 7.1},
+                              headers={"ETag": '"v1"', "Cache-Control": "max-age=0"})
+
+    tmdb = TMDBClient(base_url="http://tmdb.test/3",
+                      transport=httpx.MockTransport(handler),
+                      cache=DiskCacheBackend(str(tmp_path), max_bytes=1024 * 1024))
+    async with tmdb:
+        first = await tmdb.get("/movie/1")
+        revalidated = await tmdb.get("/movie/1")
+        fresh = await tmdb.get("/movie/1")
+
+    assert first.json() == revalidated.json() == fresh.json() == {"id": 1, "vote_average": 7.1}
+    assert revalidated.status_code == HTTPStatus.OK
+    # Третий запрос отдан из кэша без сети: после 304 запись свежая еще 60 секунд
+    assert sent_etags == [None, '"v1"']
+
+
+async def test_import_creates_actors_from_credits(db_session, actor_hydration):
+    from sqlalchemy import select
+    from core.models import Actor, MovieActor
+
+    known_actor = Actor(tmdb_id=50, name="Known Actor")
+    db_session.add(known_actor)
+    await db_session.commit()
+
+    mock_movie = {"id": 101, "title": "Second Movie", "genres": [],
+                  "credits": {"cast": [{"id": 50, "name": "Known Actor", "character": "Hero"},
+                                       {"id": 51, "name": "New Actor", "profile_path": "/new.jpg",
+                                        "popularity": 3.5, "character": "Villain"}]}}
+
+    async def side_effect_func(url, **kwargs):
+        if "movie/101" in url: return mock_movie
+        return {}
+
+    with patch("api.services.integrations.fetch_tmdb_data", new_callable=AsyncMock) as mock_fetch, \
+            patch(TMDB_FETCH_PATH, new=mock_fetch):
+        mock_fetch.side_effect = side_effect_func
+
+        await import_movie_and_relations(101, session=db_session)
+
+    assert not [c for c in mock_fetch.call_args_list if "/person/" in c.args[0]]
+    actor_hydration.queue_actor_hydration.assert_awaited_once_with([51])
+
+    new_actor = await db_session.scalar(select(Actor).where(Actor.tmdb_id == 51))
+    assert (new_actor.name, new_actor.profile_path, new_actor.biography) == ("New Actor", "/new.jpg", None)
+    links = (await db_session.scalars(select(MovieActor))).all()
+    assert {link.role_name for link in links} == {"Hero", "Villain"}
+
+
+async def test_import_upserts_only_genres_missing_from_cache(client, db_session):
+    from sqlalchemy import select
+    from core.models import Genre, MovieGenre
+    from api.services import integrations
+    from api.services.genres import genre_cache
+
+    db_session.add(Genre(tmdb_id=1, name="Action"))
+    await db_session.commit()
+    response = await client.get("/genres/")
+    assert response.headers["cache-control"] == "public, max-age=86400"
+    assert [genre["tmdb_id"] for genre in response.json()] == [1]
+
+    mock_movie = {"id": 102, "title": "Genre Movie", "credits": {"cast": []},
+                  "genres": [{"id": 1, "name": "Action"}, {"id": 2, "name": "Drama"}]}
+
+    with patch(TMDB_FETCH_PATH, new=AsyncMock(return_value=mock_movie)), \
+            patch("api.services.integrations.upsert_genres", wraps=integrations.upsert_genres) as upsert:
+        await import_movie_and_relations(102, session=db_session)
+
+    assert [genre.tmdb_id for genre in upsert.call_args.args[1]] == [2]
+    # Новый жанр сбрасывает справочник, следующий запрос видит его
+    assert sorted((await genre_cache.get_ids(db_session)).keys()) == [1, 2]
+    links = (await db_session.scalars(select(MovieGenre))).all()
+    assert len(links) == 2
+
+
+async def test_genre_cache_does_not_keep_empty_result(db_session):
+    from core.models import Genre
+    from api.services.genres import genre_cache
+
+    assert await genre_cache.get_all(db_session) == []
+    db_session.add(Genre(tmdb_id=1, name="Action"))
+    await db_session.commit()
+    assert [genre.tmdb_id for genre in await genre_cache.get_all(db_session)] == [1]
+
+
+async def test_run_hydrate_actors_fills_details(db_session, actor_hydration):
+    from datetime import date
+    from sqlalchemy import select
+    from api.services.integrations import run_hydrate_actors
+    from core.models import Actor
+    from tests.fixtures.auth_fixtures import TestingSessionLocal
+
+    db_session.add_all([Actor(tmdb_id=60, name="Actor 60"), Actor(tmdb_id=61, name="Actor 61")])
+    await db_session.commit()
+    actor_hydration.pop_actor_hydration.return_value = [60, 61, 62]
+
+    async def fake_fetch(url, **kwargs):
+        if url == "/person/60":
+            return {"id": 60, "name": "Actor 60", "biography": "Bio", "birthday": "1970-01-02"}
+        if url == "/person/62":
+            return {"id": 62, "name": "Actor 62", "birthday": "not a date"}
+        return None
+
+    with patch("api.services.integrations.async_session_maker", TestingSessionLocal), \
+            patch("api.services.integrations.fetch_tmdb_data", side_effect=fake_fetch):
+        result = await run_hydrate_actors(10)
+
+    assert result == {"hydrated": 1, "not_fetched": 2}
+    actor_hydration.queue_actor_hydration.assert_awaited_once_with([61, 62])
+    db_session.expire_all()
+    actor = await db_session.scalar(select(Actor).where(Actor.tmdb_id == 60))
+    assert (actor.biography, actor.birthday) == ("Bio", date(1970, 1, 2))
+
+
+async def test_get_actor_hydrates_pending_actor_on_view(client, db_session, actor_hydration):
+    from core.models import Actor
+
+    actor = Actor(tmdb_id=70, name="Pending Actor")
+    db_session.add(actor)
+    await db_session.commit()
+    actor_hydration.is_actor_hydration_pending.return_value = True
+
+    with patch("api.services.integrations.fetch_tmdb_data",
+               return_value={"id": 70, "name": "Pending Actor", "biography": "Bio"}):
+        response = await client.get(f"/actors/{actor.id}")
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()["biography"] == "Bio"
+    actor_hydration.complete_actor_hydration.assert_awaited_once_with([70])
+
+
+async def test_get_actor_serves_page_when_tmdb_payload_is_invalid(client, db_session, actor_hydration):
+    from core.models import Actor
+
+    actor = Actor(tmdb_id=71, name="Pending Actor")
+    db_session.add(actor)
+    await db_session.commit()
+    actor_hydration.is_actor_hydration_pending.return_value = True
+
+    with patch("api.services.integrations.fetch_tmdb_data",
+               return_value={"id": 71, "name": "Pending Actor", "biography": "x" * 10001}):
+        response = await client.get(f"/actors/{actor.id}")
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()["biography"] is None
+    actor_hydration.complete_actor_hydration.assert_not_awaited()
+
+
+def test_movie_insert_params_maps_tmdb_payload():
+    from decimal import Decimal
+    from datetime import date
+    from core.integrations.movie_dto import movie_insert_params
+
+    params = movie_insert_params({"id": 5, "title": "Movie", "release_date": "1999-10-15", "budget": 63000000,
+                                  "revenue": 0, "videos": {"results": [
+                                      {"site": "YouTube", "type": "Trailer", "iso_639_1": "en", "key": "k"}]}})
+
+    assert params["release_date"] == date(1999, 10, 15)
+    assert params["release_year"] == 1999
+    assert (params["budget"], params["revenue"]) == (Decimal(63000000), None)
+    assert params["trailer_url"] == "k"
+    with pytest.raises(ValueError):
+        movie_insert_params({"id": 6, "title": "Up"})
+
+
+async def test_upsert_actors_is_idempotent(db_session):
+    from sqlalchemy import select, func
+    from api.services.integrations import upsert_actors
+    from core.models import Actor
+
+    actor = {"tmdb_id": 77, "name": "Actor", "popularity": 1.0, "profile_path": None}
+    first = await upsert_actors(db_session, [actor, actor])
+    second = await upsert_actors(db_session, [{**actor, "popularity": 5.0}])
+    await db_session.commit()
+
+    assert first == second
+    assert await db_session.scalar(select(func.count(Actor.id))) == 1
+    assert await db_session.scalar(select(Actor.popularity).where(Actor.tmdb_id == 77)) == 5.0
+
+
+async def test_run_import_batch_reports_per_movie(db_session, test_movie):
+    from api.services.integrations import run_import_batch
+    from tests.fixtures.auth_fixtures import TestingSessionLocal
+
+    async def fake_import(tmdb_movie_id, session=None):
+        if tmdb_movie_id == 2:
+            raise RuntimeError("boom")
+        return None if tmdb_movie_id == 3 else tmdb_movie_id
+
+    with patch("api.services.integrations.async_session_maker", TestingSessionLocal), \
+            patch("api.services.integrations.import_movie_and_relations", side_effect=fake_import) as mock_import:
+        report = await run_import_batch([1, 2, 3, 155, 1])
+
+    assert mock_import.await_count == 3
+    assert report["imported"] == [1]
+    assert report["skipped"] == [155]
+    assert report["failed"] == [{"tmdb_id": 2, "error": "boom"},
+                                {"tmdb_id": 3, "error": "TMDB data unavailable"}]
+
+
+async def test_run_import_batch_skips_movies_locked_elsewhere(db_session, import_registry):
+    from api.services.integrations import run_import_batch
+    from tests.fixtures.auth_fixtures import TestingSessionLocal
+
+    import_registry.acquire_import_locks.side_effect = lambda ids: [tmdb_id for tmdb_id in ids if tmdb_id != 2]
+
+    with patch("api.services.integrations.async_session_maker", TestingSessionLocal), \
+            patch("api.services.integrations.import_movie_and_relations", return_value=None) as mock_import:
+        report = await run_import_batch([1, 2])
+
+    mock_import.assert_awaited_once_with(1)
+    assert report["in_progress"] == [2]
+    import_registry.release_import_locks.assert_awaited_once_with([1])
+    import_registry.forget_dispatch.assert_awaited_once_with([1])
+
+
+async def test_add_movie_skips_already_queued(admin_client, import_registry):
+    import_registry.claim_for_dispatch.side_effect = lambda ids: []
+
+    with patch("api.routers.integrations.import_single_movie.apply_async") as mock_apply:
+        response = await admin_client.get("/integrations/550")
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()["status"] == "DUPLICATE"
+    mock_apply.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "payload, expected_status",
+    [
+        ({"tmdb_movie_ids": [1, 2, 3]}, HTTPStatus.OK),
+        ({"tmdb_movie_ids": []}, HTTPStatus.UNPROCESSABLE_ENTITY),
+    ]
+)
+async def test_add_movies_batch(admin_client, payload, expected_status):
+    with patch("api.routers.integrations.import_movies_batch.apply_async",
+               return_value=MagicMock(id="task-1")) as mock_apply:
+        response = await admin_client.post("/integrations/batch", json=payload)
+
+    assert response.status_code == expected_status
+    if expected_status == HTTPStatus.OK:
+        mock_apply.assert_called_once_with(kwargs={"tmdb_movie_ids": [1, 2, 3]}, queue="interactive")
+        assert response.json()["task_id"] == "task-1"
+
+
+async def test_publish_tasks_shares_one_producer():
+    from worker.publisher import TaskMessage, publish_tasks
+
+    with patch("worker.publisher.celery_app.send_task",
+               side_effect=lambda name, **kwargs: MagicMock(id=f"task-{kwargs['kwargs']['n']}")) as mock_send:
+        task_ids = await publish_tasks([TaskMessage("worker.tasks.a", {"n": 1}),
+                                        TaskMessage("worker.tasks.b", {"n": 2}, {"countdown": 10})])
+
+    assert task_ids == ["task-1", "task-2"]
+    producers = {id(c.kwargs["producer"]) for c in mock_send.call_args_list}
+    assert len(producers) == 1
+    assert mock_send.call_args_list[1].kwargs["countdown"] == 10
+
+
+def test_tasks_are_routed_by_weight():
+    from worker.celery_app import celery_app
+
+    def queue_of(task_name):
+        return celery_app.amqp.router.route({}, task_name)["queue"].name
+
+    assert queue_of("worker.tasks.initial_load") == "crawl"
+    assert queue_of("worker.tasks.import_movies_batch") == "import"
+    assert queue_of("worker.tasks.update_movies_stats_batch") == "refresh"
+    assert queue_of("worker.tasks.refresh_stale_movies") == "refresh"
+
+
+def test_worker_runtime_reuses_event_loop():
+    import asyncio
+    from worker.runtime import run_async
+
+    async def current_loop():
+        return asyncio.get_running_loop()
+
+    assert run_async(current_loop()) is run_async(current_loop())
+
+
+async def test_run_initial_load_dispatches_only_new_movies(db_session, test_movie, import_registry):
+    from api.services.integrations import run_initial_load
+    from tests.fixtures.auth_fixtures import TestingSessionLocal
+
+    pages = {1: [155, 1001, 1002], 2: [27205, 1002, 1003], 3: []}
+
+    async def fake_fetch_page(page):
+        return {"results": [{"id": tmdb_id} for tmdb_id in pages[page]]}
+
+    with patch("api.services.integrations.async_session_maker", TestingSessionLocal), \
+            patch("api.services.integrations.fetch_popular_movie_ids", side_effect=fake_fetch_page), \
+            patch("worker.publisher.celery_app.send_task") as mock_send:
+        stats = await run_initial_load(1, 5)
+
+    dispatched = [tmdb_id for c in mock_send.call_args_list for tmdb_id in c.kwargs["kwargs"]["tmdb_movie_ids"]]
+    assert dispatched == [1001, 1002, 1003]
+    assert stats["pages"] == 2
+    assert stats["existing"] == 2
+    import_registry.record_page_yields.assert_awaited_once_with({1: 2, 2: 1})
+
+
+async def test_run_crawl_pages_resumes_from_checkpoint(db_session):
+    from api.services.integrations import run_crawl_pages
+    from tests.fixtures.auth_fixtures import TestingSessionLocal
+
+    saved_run = {"run_id": "run-1", "status": "running", "pages": [1, 2, 3], "cursor": 2,
+                 "stats": {"pages": 2, "found": 40, "existing": 0, "dispatched": 40,
+                           "duplicates": 0, "failed_pages": 0},
+                 "started_at": 0.0, "updated_at": 0.0}
+    saved_states = []
+
+    async def fake_fetch_page(page):
+        return {"results": [{"id": 3000 + page}]}
+
+    async def fake_save(run):
+        saved_states.append((run["status"], run["cursor"]))
+
+    with patch("api.services.integrations.async_session_maker", TestingSessionLocal), \
+            patch("api.services.integrations.settings.CRAWL_PAGE_BATCH_SIZE", 1), \
+            patch("api.services.integrations.start_crawl_run", return_value=saved_run), \
+            patch("api.services.integrations.save_crawl_run", side_effect=fake_save), \
+            patch("api.services.integrations.fetch_popular_movie_ids", side_effect=fake_fetch_page) as mock_fetch, \
+            patch("worker.publisher.celery_app.send_task"):
+        stats = await run_crawl_pages([1, 2, 3], run_id="run-1")
+
+    mock_fetch.assert_awaited_once_with(3)
+    assert stats["pages"] == 3
+    assert stats["dispatched"] == 41
+    assert saved_states == [("running", 3), ("finished", 3)]
+
+
+async def test_wait_for_queue_capacity_pauses_until_low_water():
+    from worker.queues import wait_for_queue_capacity
+
+    depths = iter([250, 120, 51, 50])
+
+    async def fake_depths():
+        return {"import": next(depths)}
+
+    with patch("worker.queues.get_queue_depths", side_effect=fake_depths) as mock_depths, \
+            patch("worker.queues.asyncio.sleep", new_callable=AsyncMock) as mock_sleep:
+        await wait_for_queue_capacity("import", high_water=200, low_water=50)
+
+    assert mock_depths.await_count == 4
+    assert mock_sleep.await_count == 3
+
+
+async def test_dispatch_import_batches_checks_capacity_between_chunks(import_registry):
+    from api.services.integrations import dispatch_import_batches
+
+    with patch("api.services.integrations.settings.IMPORT_BATCH_SIZE", 2), \
+            patch("api.services.integrations.settings.IMPORT_PUBLISH_CHUNK", 2), \
+            patch("worker.publisher.celery_app.send_task") as mock_send:
+        queued = await dispatch_import_batches(list(range(1, 10)))
+
+    assert queued == 9
+    assert mock_send.call_count == 5
+    assert import_registry.wait_for_queue_capacity.await_count == 3
+
+
+async def test_get_crawl_run_not_found(admin_client):
+    with patch("api.routers.integrations.load_crawl_run", return_value=None):
+        response = await admin_client.get("/integrations/crawl_runs/unknown")
+
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+def test_plan_pages_skips_dead_pages_and_extends_frontier():
+    from core.integrations.crawl_planner import PageYield, plan_pages
+
+    now = 1_000_000.0
+    day = 24 * 3600
+    history = {
+        1: PageYield(ewma=5.0, crawls=3, last_crawled=now - day),
+        2: PageYield(ewma=0.0, crawls=3, last_crawled=now - day),        # пустая, проверена недавно
+        3: PageYield(ewma=0.1, crawls=3, last_crawled=now - 30 * day),   # пустая, пора перепроверить
+        4: PageYield(ewma=2.0, crawls=3, last_crawled=now - day),
+        5: PageYield(ewma=1.0, crawls=3, last_crawled=now - day),
+        6: PageYield(ewma=0.6, crawls=3, last_crawled=now - day),
+    }
+
+    # Страницы 4-6 приносят новое: диапазон расширяется на 7-11, которые еще не обходили
+    assert plan_pages(history, 1, 6, now) == [1, 3, 4, 5, 6, 7, 8, 9, 10, 11]
+    # Страница 2 в хвосте пустая: диапазон не расширяется
+    assert plan_pages(history, 1, 2, now) == [1]
+
+
+async def test_run_sync_changes_refreshes_only_known_movies(db_session, test_movie):
+    from api.services.integrations import run_sync_changes, CHANGES_CHECKPOINT_KEY
+    from tests.fixtures.auth_fixtures import TestingSessionLocal
+
+    changes = {
+        1: {"results": [{"id": 155}, {"id": 5000}], "page": 1, "total_pages": 2},
+        2: {"results": [{"id": 27205, "adult": False}, {"id": 6000, "adult": True}], "page": 2, "total_pages": 2},
+    }
+
+    async def fake_fetch(url, params=None):
+        return changes[params["page"]]
+
+    redis = AsyncMock()
+    redis.get.return_value = None
+    redis.smembers.return_value = set()
+
+    with patch("api.services.integrations.async_session_maker", TestingSessionLocal), \
+            patch("api.services.integrations.get_redis", return_value=redis), \
+            patch("api.services.integrations.fetch_tmdb_data", side_effect=fake_fetch), \
+            patch("worker.publisher.celery_app.send_task") as mock_send:
+        result = await run_sync_changes()
+        # Следующий запуск в тот же день не отправляет уже отправленные фильмы повторно
+        redis.smembers.return_value = {"155", "5000"}
+        mock_send.reset_mock()
+        second = await run_sync_changes()
+
+    assert (result["changed"], result["dispatched"]) == (3, 2)
+    assert redis.set.await_args.args[0] == CHANGES_CHECKPOINT_KEY
+    assert second["dispatched"] == 1
+    refreshed = sorted(tmdb_id for c in mock_send.call_args_list for tmdb_id in c.kwargs["kwargs"]["tmdb_movie_ids"])
+    assert refreshed == [27205]
+
+
+async def test_plan_stale_refresh_prioritizes_hot_titles(db_session):
+    from datetime import datetime, timedelta, timezone
+    from api.services.integrations import plan_stale_refresh
+    from core.models import Movie
+
+    # func.now() в SQLite пишет UTC без часового пояса
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    movies = [
+        (1, 500.0, now - timedelta(hours=2)),   # горячий, устарел
+        (2, 500.0, now - timedelta(minutes=5)),  # горячий, свежий
+        (3, 50.0, now - timedelta(days=2)),      # теплый, устарел
+        (4, 1.0, now - timedelta(days=3)),       # хвост, еще свежий
+        (5, 1.0, now - timedelta(days=30)),      # хвост, устарел
+    ]
+    for tmdb_id, popularity, updated in movies:
+        db_session.add(Movie(tmdb_id=tmdb_id, title=f"Movie {tmdb_id}", release_year=2020,
+                             rating=5.0, popularity=popularity, update_date_at=updated))
+    await db_session.commit()
+
+    assert await plan_stale_refresh(db_session, budget=10) == {"hot": [1], "warm": [3], "tail": [5]}
+    assert await plan_stale_refresh(db_session, budget=2) == {"hot": [1], "warm": [3]}
+
+
+async def test_apply_movie_stats_updates_in_bulk(db_session, test_movie):
+    from sqlalchemy import select
+    from api.services.integrations import apply_movie_stats
+    from core.models import Movie
+
+    updated = await apply_movie_stats(db_session, [
+        {"tmdb_id": 155, "rating": 9.1, "popularity": 300.0},
+        {"tmdb_id": 27205, "rating": 8.8, "popularity": 250.0},
+        {"tmdb_id": 999999, "rating": 1.0, "popularity": 1.0},
+    ])
+    await db_session.commit()
+
+    assert updated == 2
+    rows = (await db_session.execute(
+        select(Movie.tmdb_id, Movie.rating, Movie.popularity).order_by(Movie.tmdb_id))).all()
+    assert [tuple(row) for row in rows] == [(155, 9.1, 300.0), (27205, 8.8, 250.0), (798645, 6.8, 100.0)]
+
+
+async def test_run_update_stats_batch_keeps_stats_missing_in_tmdb(db_session, test_movie):
+    from sqlalchemy import select
+    from api.services.integrations import run_update_stats_batch
+    from core.models import Movie
+    from tests.fixtures.auth_fixtures import TestingSessionLocal
+
+    payloads = {155: {"vote_average": 9.1, "popularity": 300.0}, 27205: {"vote_average": 8.8}}
+
+    async def fake_fetch(url, **kwargs):
+        return payloads[int(url.rsplit("/", 1)[1])]
+
+    with patch("api.services.integrations.async_session_maker", TestingSessionLocal), \
+            patch("api.services.integrations.fetch_tmdb_data", side_effect=fake_fetch):
+        result = await run_update_stats_batch([155, 27205])
+
+    assert result == {"updated": 1, "not_fetched": 1}
+    rows = dict((await db_session.execute(select(Movie.tmdb_id, Movie.popularity))).all())
+    assert rows[155] == 300.0
+    assert rows[27205] != 0.0
+
+
+async def test_run_export_load_streams_and_diffs(db_session, test_movie, tmp_path):
+    import gzip
+    import json
+    from api.services.integrations import run_export_load
+    from tests.fixtures.auth_fixtures import TestingSessionLocal
+
+    export_path = tmp_path / "movie_ids.json.gz"
+    rows = [
+        {"id": 155, "popularity": 50.0},
+        {"id": 2001, "popularity": 12.0},
+        {"id": 2002, "popularity": 0.5},
+        {"id": 2003, "popularity": 30.0, "adult": True},
+        {"id": 2004, "popularity": 8.0},
+    ]
+    with gzip.open(export_path, "wt", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row) + "\n")
+        f.write("not json\n")
+
+    with patch("api.services.integrations.async_session_maker", TestingSessionLocal), \
+            patch("api.services.integrations.settings.EXPORT_CHUNK_SIZE", 2), \
+            patch("worker.publisher.celery_app.send_task") as mock_send:
+        stats = await run_export_load(str(export_path), min_popularity=1.0)
+
+    dispatched = [tmdb_id for c in mock_send.call_args_list for tmdb_id in c.kwargs["kwargs"]["tmdb_movie_ids"]]
+    assert dispatched == [2001, 2004]
+    assert stats == {"read": 3, "existing": 1, "new": 2}
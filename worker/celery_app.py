@@ -1,5 +1,4 @@
 import os
-from datetime import datetime
 
 from celery import Celery
 from celery.schedules import crontab
@@ -15,27 +14,69 @@ celery_app = Celery(
     backend=backend_url,
     include=['worker.tasks']
 )
-def get_dynamic_range():
-    # Например, в четные дни качаем страницы 10-20, в нечетные 20-30
-    day = datetime.now().day
-    if day % 2 == 0:
-        return (10, 20)
-    return (20, 30)
 
+# Очереди по тяжести задач: обход страниц не должен задерживать обновление статистики и ручной импорт
+QUEUE_CRAWL = 'crawl'              # координация: обход страниц и выгрузка
+QUEUE_IMPORT = 'import'            # тяжелый импорт фильмов
+QUEUE_REFRESH = 'refresh'          # легкие обновления статистики, их планировщики и догрузка актеров
+QUEUE_INTERACTIVE = 'interactive'  # задачи, запущенные администратором из API
+QUEUES = (QUEUE_CRAWL, QUEUE_IMPORT, QUEUE_REFRESH, QUEUE_INTERACTIVE)
+
+celery_app.conf.task_default_queue = QUEUE_IMPORT
+celery_app.conf.task_routes = {
+    'worker.tasks.initial_load': {'queue': QUEUE_CRAWL},
+    'worker.tasks.adaptive_crawl': {'queue': QUEUE_CRAWL},
+    'worker.tasks.sync_popular_movies_by_page': {'queue': QUEUE_CRAWL},
+    'worker.tasks.load_tmdb_export': {'queue': QUEUE_CRAWL},
+    'worker.tasks.import_single_movie': {'queue': QUEUE_IMPORT},
+    'worker.tasks.import_movies_batch': {'queue': QUEUE_IMPORT},
+    # Планировщики обновлений не ставим в crawl: обход, ждущий разгрузки очереди import,
+    # занимал бы единственный слот воркера crawl и задерживал обновление популярных фильмов
+    'worker.tasks.sync_oldest_movies': {'queue': QUEUE_REFRESH},
+    'worker.tasks.refresh_stale_movies': {'queue': QUEUE_REFRESH},
+    'worker.tasks.sync_tmdb_changes': {'queue': QUEUE_REFRESH},
+    'worker.tasks.update_single_movie_stats': {'queue': QUEUE_REFRESH},
+    'worker.tasks.update_movies_stats_batch': {'queue': QUEUE_REFRESH},
+    'worker.tasks.hydrate_actors': {'queue': QUEUE_REFRESH},
+}
+# Задача подтверждается после выполнения: при падении воркера она вернется в очередь.
+# Импорт и обновления идемпотентны, поэтому повтор безопасен
+celery_app.conf.task_acks_late = True
+celery_app.conf.task_reject_on_worker_lost = True
+# Длинные задачи не должны копиться в предвыборке одного процесса, пока другие простаивают
+celery_app.conf.worker_prefetch_multiplier = settings.CELERY_PREFETCH_MULTIPLIER
+# Неподтвержденная задача возвращается в очередь через visibility_timeout: он должен быть длиннее самой долгой
+celery_app.conf.broker_transport_options = {'visibility_timeout': settings.CELERY_VISIBILITY_TIMEOUT}
+
+# Диапазоны — только отправные точки: adaptive_crawl пропускает страницы без новых фильмов
+# и расширяет диапазон, пока его последние страницы приносят новое
 celery_app.conf.beat_schedule = {
     'import-daily-top': {
-        'task': 'worker.tasks.initial_load',
+        'task': 'worker.tasks.adaptive_crawl',
         'schedule': crontab(minute=6, hour=0),
         'args': (1, 5),
     },
     'import-deep-archive': {
-        'task': 'worker.tasks.initial_load',
+        'task': 'worker.tasks.adaptive_crawl',
         'schedule': crontab(day_of_week='sun', hour=3, minute=0),
         'args': (50, 100),
     },
     'update-day-deep': {
-        'task': 'worker.tasks.initial_load',
+        'task': 'worker.tasks.adaptive_crawl',
         'schedule': crontab(minute=0, hour='*/4'),
         'kwargs': {'start_page': 6, 'end_page': 15},
     },
+    'refresh-stale-movies': {
+        'task': 'worker.tasks.refresh_stale_movies',
+        'schedule': crontab(minute='*/30'),
+    },
+    'sync-tmdb-changes': {
+        'task': 'worker.tasks.sync_tmdb_changes',
+        'schedule': crontab(minute=30),
+    },
+    'hydrate-actors': {
+        'task': 'worker.tasks.hydrate_actors',
+        'schedule': crontab(minute='*/10'),
+        'kwargs': {'limit': settings.ACTOR_HYDRATION_BATCH},
+    },
 }
\ No newline at end of file
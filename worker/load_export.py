@@ -0,0 +1,36 @@
+"""
+Загрузка каталога из файла ежедневной выгрузки TMDb (movie_ids_MM_DD_YYYY.json.gz).
+
+    python -m worker.load_export movie_ids_05_15_2025.json.gz --min-popularity 5
+    python -m worker.load_export movie_ids_05_15_2025.json.gz --inline
+
+По умолчанию новые фильмы ставятся в очередь пакетного импорта Celery,
+с --inline импортируются прямо в этом процессе.
+"""
+import argparse
+import asyncio
+
+from api.services.integrations import run_export_load
+from core.config import settings
+from core.db import async_engine
+from core.integrations.tmdb_client import tmdb_client
+from core.redis import close_redis
+
+
+async def main(path: str, min_popularity: float, inline: bool):
+    try:
+        async with tmdb_client:
+            stats = await run_export_load(path, min_popularity, dispatch=not inline)
+    finally:
+        await close_redis()
+        await async_engine.dispose()
+    print(f"Готово: прочитано {stats['read']}, уже в базе {stats['existing']}, новых {stats['new']}.")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path', help='Путь к gzip-файлу выгрузки TMDb')
+    parser.add_argument('--min-popularity', type=float, default=settings.EXPORT_MIN_POPULARITY)
+    parser.add_argument('--inline', action='store_true', help='Импортировать в этом процессе, без Celery')
+    args = parser.parse_args()
+    asyncio.run(main(args.path, args.min_popularity, args.inline))
@@ -0,0 +1,28 @@
+import asyncio
+from typing import Any, Dict, List, NamedTuple
+
+from worker.celery_app import celery_app
+
+
+class TaskMessage(NamedTuple):
+    """Задача для публикации: имя, аргументы и опции send_task (countdown, queue...)."""
+    name: str
+    kwargs: Dict[str, Any]
+    options: Dict[str, Any] = {}
+
+
+def _publish(messages: List[TaskMessage]) -> List[str]:
+    # Один producer и одно соединение с брокером на всю пачку вместо захвата из пула на каждую задачу
+    with celery_app.producer_or_acquire() as producer:
+        return [celery_app.send_task(message.name, kwargs=message.kwargs, producer=producer, **message.options).id
+                for message in messages]
+
+
+async def publish_tasks(messages: List[TaskMessage]) -> List[str]:
+    """
+    Публикует пачку задач Celery, не блокируя цикл событий: синхронные записи в брокер
+    выполняются в отдельном потоке. Возвращает id задач.
+    """
+    if not messages:
+        return []
+    return await asyncio.to_thread(_publish, messages)
@@ -0,0 +1,65 @@
+import asyncio
+import time
+from typing import Dict
+
+from redis.exceptions import RedisError
+
+from core.config import settings
+from core.redis import get_broker_redis
+from worker.celery_app import QUEUES
+
+# Транспорт Redis раскладывает сообщения с приоритетом по спискам "<очередь>\x06\x16<шаг>"
+PRIORITY_SEP = '\x06\x16'
+PRIORITY_STEPS = (3, 6, 9)
+# Задачи, которые воркеры забрали, но еще не подтвердили (acks_late), и отложенные по countdown
+UNACKED_KEY = 'unacked'
+
+
+async def get_queue_depths() -> Dict[str, int]:
+    """
+    Возвращает число ожидающих задач в каждой очереди брокера и число забранных, но не подтвержденных.
+    Метрика для наблюдения и автомасштабирования воркеров.
+    """
+    redis = get_broker_redis()
+    async with redis.pipeline(transaction=False) as pipe:
+        for queue in QUEUES:
+            pipe.llen(queue)
+            for step in PRIORITY_STEPS:
+                pipe.llen(f'{queue}{PRIORITY_SEP}{step}')
+        pipe.hlen(UNACKED_KEY)
+        lengths = await pipe.execute()
+
+    per_queue = len(PRIORITY_STEPS) + 1
+    depths = {queue: sum(lengths[i * per_queue:(i + 1) * per_queue]) for i, queue in enumerate(QUEUES)}
+    depths[UNACKED_KEY] = lengths[-1]
+    return depths
+
+
+async def wait_for_queue_capacity(queue: str, high_water: int, low_water: int) -> float:
+    """
+    Придерживает публикацию, пока очередь переполнена: если в ней high_water задач или больше,
+    ждет, пока она разгрузится до low_water (не дольше BACKPRESSURE_MAX_WAIT).
+    Возвращает, сколько секунд пришлось ждать. Без доступа к брокеру не ждет.
+    """
+    started = time.monotonic()
+    threshold = high_water
+    while True:
+        try:
+            depth = (await get_queue_depths())[queue]
+        except RedisError as e:
+            print(f"⚠️ Queue depth unavailable, publishing without backpressure: {e}")
+            break
+        if depth < threshold:
+            break
+
+        waited = time.monotonic() - started
+        if waited >= settings.BACKPRESSURE_MAX_WAIT:
+            print(f"⚠️ Queue {queue} is still at {depth} after {waited:.0f}s, publishing anyway.")
+            break
+        if threshold == high_water:
+            print(f"⏸️ Queue {queue} has {depth} tasks, pausing until it drains to {low_water}.")
+        # После паузы продолжаем только ниже low_water, чтобы не дергаться у самой границы
+        threshold = low_water + 1
+        await asyncio.sleep(settings.BACKPRESSURE_POLL_INTERVAL)
+
+    return time.monotonic() - started
@@ -0,0 +1,54 @@
+import asyncio
+from typing import Optional
+
+from celery.signals import worker_process_init, worker_process_shutdown, worker_shutdown
+
+from core.db import async_engine
+from core.integrations.tmdb_client import tmdb_client
+from core.redis import close_redis
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """
+    Возвращает постоянный цикл событий процесса воркера, создавая его при первом обращении.
+    """
+    global _loop
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+    return _loop
+
+
+def run_async(coro):
+    """
+    Выполняет корутину задачи в постоянном цикле событий процесса.
+    Пул соединений TMDb, Redis и БД живут в этом цикле и переиспользуются между задачами.
+    """
+    return get_loop().run_until_complete(coro)
+
+
+async def _close_resources():
+    await tmdb_client.close()
+    await close_redis()
+    await async_engine.dispose()
+
+
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    """Готовит дочерний процесс prefork: свой пул соединений к БД и открытый клиент TMDb."""
+    # Соединения, унаследованные от родителя при fork, в дочернем процессе использовать нельзя
+    async_engine.sync_engine.dispose(close=False)
+    run_async(tmdb_client.open())
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def shutdown_worker_process(**kwargs):
+    """Закрывает соединения и цикл событий при остановке процесса воркера."""
+    global _loop
+    if _loop is None or _loop.is_closed():
+        return
+    _loop.run_until_complete(_close_resources())
+    _loop.close()
+    _loop = None
@@ -1,19 +1,26 @@
-import asyncio
-
 from worker.celery_app import celery_app
 from api.services.integrations import (
-    import_movie_and_relations,
+    run_import_batch,
+    run_adaptive_crawl,
+    run_export_load,
+    run_hydrate_actors,
     run_initial_load,
+    run_refresh_stale,
+    run_sync_changes,
     run_sync_oldest,
+    run_update_stats_batch,
     update_movie_stats)
 from core.integrations.tmdb_client import fetch_popular_movie_ids
+from worker.runtime import run_async
+from core.config import settings
 
 
 async def _async_import_single_movie(tmdb_movie_id: int):
     """
     Асинхронная обертка для вызова импорта фильма.
+    Идет через пакетный импорт, чтобы фильм не импортировался дважды параллельно с другим воркером.
     """
-    await import_movie_and_relations(tmdb_movie_id)
+    return await run_import_batch([tmdb_movie_id])
 
 
 @celery_app.task(name='worker.tasks.import_single_movie')
@@ -23,8 +30,18 @@ def import_single_movie(tmdb_movie_id: int):
     Эта задача будет вызываться ДРУГИМИ задачами.
     """
     print(f"Celery: Task received for TMDB ID: {tmdb_movie_id}")
-    asyncio.run(_async_import_single_movie(tmdb_movie_id=tmdb_movie_id))
+    return run_async(_async_import_single_movie(tmdb_movie_id=tmdb_movie_id))
+
+
 
+@celery_app.task(name='worker.tasks.import_movies_batch')
+def import_movies_batch(tmdb_movie_ids: list[int]):
+    """
+    Импортирует пачку фильмов за один запуск задачи: один цикл событий и один пул соединений
+    на все фильмы. Возвращает отчет по каждому фильму (импортирован, пропущен, ошибка).
+    """
+    print(f"Celery: Batch import received for {len(tmdb_movie_ids)} TMDB IDs")
+    return run_async(run_import_batch(tmdb_movie_ids))
 
 
 async def _async_import_popular_movie_id(page: int):
@@ -43,24 +60,66 @@ def sync_popular_movies_by_page(page: int):
     и запускает процесс сохранения их ID или постановки задач на импорт.
     """
     print(f"Celery: Fetching popular movies IDs from TMDB page: {page}")
-    asyncio.run(_async_import_popular_movie_id(page))
+    run_async(_async_import_popular_movie_id(page))
+
+
+@celery_app.task(name='worker.tasks.initial_load', bind=True)
+def initial_load(self, start_page: int = 1, end_page: int = 5):
+    """
+    Задача для запуска начальной загрузки популярных фильмов.
+    id задачи — id обхода: после перезапуска воркера задача продолжит с последней пройденной группы страниц.
+    """
+    return run_async(run_initial_load(start_page, end_page, run_id=self.request.id))
+
 
+@celery_app.task(name='worker.tasks.adaptive_crawl', bind=True)
+def adaptive_crawl(self, start_page: int = 1, end_page: int = 5):
+    """Обход страниц популярного по плану из истории их отдачи (пустые страницы пропускаются)."""
+    return run_async(run_adaptive_crawl(start_page, end_page, run_id=self.request.id))
 
-@celery_app.task(name='worker.tasks.initial_load')
-def initial_load(start_page: int = 1, end_page: int = 5):
-    """Задача для запуска начальной загрузки популярных фильмов."""
-    asyncio.run(run_initial_load(start_page, end_page))
+
+@celery_app.task(name='worker.tasks.load_tmdb_export')
+def load_tmdb_export(path: str, min_popularity: float = None):
+    """Ставит на импорт новые фильмы из файла ежедневной выгрузки TMDb, лежащего на диске воркера."""
+    if min_popularity is None:
+        min_popularity = settings.EXPORT_MIN_POPULARITY
+    return run_async(run_export_load(path, min_popularity))
 
 
 @celery_app.task(name='worker.tasks.sync_oldest_movies')
 def sync_oldest_movies(batch_size: int = 50):
     """Находит фильмы, которые дольше всего не обновлялись, и запускает их апдейт."""
-    asyncio.run(run_sync_oldest(batch_size))
+    run_async(run_sync_oldest(batch_size))
+
+@celery_app.task(name='worker.tasks.refresh_stale_movies')
+def refresh_stale_movies(budget: int = None):
+    """Обновляет самые устаревшие фильмы с учетом их популярности в пределах бюджета запуска."""
+    return run_async(run_refresh_stale(budget or settings.REFRESH_BUDGET_PER_RUN))
+
+@celery_app.task(name='worker.tasks.sync_tmdb_changes')
+def sync_tmdb_changes():
+    """Обновляет фильмы, изменившиеся в TMDb с прошлой синхронизации (лента /movie/changes)."""
+    return run_async(run_sync_changes())
 
 @celery_app.task(name='worker.tasks.update_single_movie_stats')
 def update_single_movie_stats(tmdb_movie_id: int):
     """
     Легкая задача: обновить только рейтинг и популярность.
     """
-    asyncio.run(update_movie_stats(tmdb_movie_id))
+    run_async(update_movie_stats(tmdb_movie_id))
+
+
+@celery_app.task(name='worker.tasks.update_movies_stats_batch')
+def update_movies_stats_batch(tmdb_movie_ids: list[int]):
+    """
+    Легкая задача: обновить рейтинг и популярность списка фильмов одним запросом к БД.
+    """
+    return run_async(run_update_stats_batch(tmdb_movie_ids))
+
 
+@celery_app.task(name='worker.tasks.hydrate_actors')
+def hydrate_actors(limit: int = None):
+    """
+    Фоновая догрузка биографии и дат актеров, созданных при импорте только из состава фильма.
+    """
+    return run_async(run_hydrate_actors(limit or settings.ACTOR_HYDRATION_BATCH))